@@ -0,0 +1,197 @@
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import time
+import tracemalloc
+
+from lib.codec import decode_tick, encode_command
+from lib.knowledge import MazeCache
+from lib.simulator import Backend, LEVELS
+from lib.solver import Solver
+from lib.speculation import Speculator
+from lib.store import DictStore, GridStore
+from lib.tiles import TileStore
+from lib.trace import Tracer, OFF
+
+# Solver settings per mode, see README for the per-level choices made on live runs.
+MODES = {
+    "dfs": {"use_DFS": True, "use_heuristics_in_dfs": True},
+    "astar": {"use_DFS": False},
+    "dfs-tree": {"use_DFS": True, "use_heuristics_in_dfs": True, "use_route_planner": False},
+    "astar-tree": {"use_DFS": False, "use_route_planner": False},
+    "frontier": {"use_DFS": False, "use_frontier": True, "dist_to_go_factor": 3},
+}
+
+STORES = {
+    "grid": GridStore,
+    "dict": DictStore,
+    "tiles": TileStore,
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Plays one offline game with main.generate_commands and collects the results.
+# With memory=True the game runs under tracemalloc, which slows it down but reports the peak allocation.
+# With trace set to a directory, the per-tick trace of the game is written there as JSON lines.
+# With maze set (e.g. one rebuilt from a recording) that maze is played instead of generating one for level.
+# With cache set to a directory, walls seen in earlier runs of the same maze are reused and new ones are saved there.
+# With settings given they are used as the solver settings instead of the ones of mode.
+# store_settings are passed to the store, e.g. max_bytes and spill of the tiles store.
+def run_game(level, mode, seed, max_ticks, loop_density=None, size=None, store="grid", memory=False, speculate=False,
+             trace=None, maze=None, cache=None, prune=True, corridors=None, settings=None, store_settings=None):
+    backend = Backend()
+    if maze is not None:
+        game_id = backend.add_game(maze)["entityId"]
+    else:
+        game_id = backend.create_game(level, seed=seed, loop_density=loop_density, size=size)["entityId"]
+    if memory:
+        tracemalloc.start()
+    trace_file = None
+    if trace is not None:
+        trace_file = os.path.join(trace, f"{level}-{mode}-{store}-{seed}.jsonl")
+    knowledge = MazeCache(cache, level) if cache is not None else None
+    if settings is None:
+        settings = MODES[mode]
+    solver = Solver(**settings, store=functools.partial(STORES[store], **(store_settings or {})), tracer=Tracer(OFF, trace_file), knowledge=knowledge,
+                    use_pruning=prune, use_corridors=corridors)
+    speculator = Speculator(solver) if speculate else None
+    game = backend.games[game_id]
+    latencies = list()
+    messages = backend.handle(json.dumps(["sub-game", {"id": game_id}]))
+    result = "timeout"
+    # Solver logging is off, but error prints still go to a sink that is emptied every tick.
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        while len(latencies) < max_ticks:
+            game_state = [state for _, _, state in map(decode_tick, messages) if state is not None][-1]
+            if game_state["status"] != "IN_PROGRESS":
+                result = "finished"
+                break
+
+            start = time.perf_counter_ns()
+            try:
+                if speculator is None:
+                    commands = solver.generate_commands(game_state)
+                else:
+                    commands = speculator.generate_commands(game_state)
+            except Exception as error:
+                # A crashing solver is a result too, keep benchmarking the other games.
+                result = f"crash:{type(error).__name__}"
+                break
+            latencies.append(time.perf_counter_ns() - start)
+            sink.seek(0)
+            sink.truncate()
+
+            if commands is None:
+                result = "stuck"
+                break
+            if speculator is not None:
+                speculator.speculate(game_state, commands)
+            messages = backend.handle(encode_command(game_id, commands))
+
+        if speculator is not None and speculator.pending is not None:
+            speculator.pending[1].result()
+            solver.rollback()
+    solver.tracer.close()
+    if hasattr(solver.cells, "close"):
+        solver.cells.close()
+    if knowledge is not None:
+        knowledge.close()
+    peak = 0
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        "level": level,
+        "mode": mode,
+        "store": store,
+        "seed": seed,
+        "size": f"{game.maze.width}x{game.maze.height}",
+        "result": result,
+        "ticks": game.timer,
+        "score": game.score,
+        "p50_us": percentile(latencies, 0.5) / 1000,
+        "p99_us": percentile(latencies, 0.99) / 1000,
+        "ticks_per_s": len(latencies) / (sum(latencies) / 1e9) if latencies else 0,
+        "cells": len(solver.cells),
+        "peak_kib": peak / 1024,
+        "open_set": solver.prio_queue.stats(),
+        "speculation": None if speculator is None else speculator.stats(),
+        "trace": solver.summary(),
+    }
+
+
+def print_results(results):
+    header = f"{'level':>5} {'mode':>10} {'store':>5} {'size':>10} {'result':>18} {'ticks':>8} {'score':>7} " \
+             f"{'p50 us':>9} {'p99 us':>9} {'search us':>9} {'nav us':>9} {'ticks/s':>9} {'cells':>8} {'peak KiB':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        phases = r['trace']['us_per_tick']
+        print(f"{r['level']:>5} {r['mode']:>10} {r['store']:>5} {r['size']:>10} {r['result']:>18} {r['ticks']:>8} {r['score']:>7} "
+              f"{r['p50_us']:>9.1f} {r['p99_us']:>9.1f} {phases.get('search', 0):>9.1f} {phases.get('navigation', 0):>9.1f} "
+              f"{r['ticks_per_s']:>9.0f} {r['cells']:>8} {r['peak_kib']:>9.0f}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Run the solvers against the offline goldrush simulator.")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--modes", nargs="+", choices=MODES.keys(), default=["dfs", "astar"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ticks", type=int, default=200000)
+    parser.add_argument("--loop-density", type=float, default=None)
+    parser.add_argument("--stores", nargs="+", choices=STORES.keys(), default=["grid"],
+                        help="Maze stores to compare, e.g. --stores grid dict.")
+    parser.add_argument("--size", type=int, nargs=2, metavar=("W", "H"), default=None,
+                        help="Maze size instead of the level's, e.g. for load testing the tiles store.")
+    parser.add_argument("--tile-memory", type=float, metavar="MIB", default=None,
+                        help="Most MiB of unpacked tiles the tiles store keeps (default 64).")
+    parser.add_argument("--spill", metavar="DIR", default=None, help="Spill packed tiles to a file in DIR.")
+    parser.add_argument("--memory", action="store_true", help="Trace peak memory (slow).")
+    parser.add_argument("--speculate", action="store_true", help="Precompute the next decision on a worker thread.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    parser.add_argument("--cache", metavar="DIR", default=None,
+                        help="Keep discovered walls in DIR and reuse them when the same maze is played again.")
+    parser.add_argument("--no-prune", action="store_true", help="Keep frontier cells of enclosed regions.")
+    parser.add_argument("--corridors", choices=["on", "off"], default=None,
+                        help="Plan routes over corridors or single cells (default: corridors for A* only).")
+    parser.add_argument("--trace", metavar="DIR", default=None, help="Write a per-tick JSONL trace of every game to DIR.")
+    args = parser.parse_args()
+
+    if args.trace is not None:
+        os.makedirs(args.trace, exist_ok=True)
+    store_settings = dict()
+    if args.tile_memory is not None:
+        store_settings["max_bytes"] = int(args.tile_memory * 2**20)
+    if args.spill is not None:
+        store_settings["spill"] = args.spill
+    if store_settings and args.stores != ["tiles"]:
+        parser.error("--tile-memory and --spill are only for --stores tiles")
+    results = list()
+    for level in args.levels:
+        if level not in LEVELS:
+            parser.error(f"Unknown level {level}")
+        for mode in args.modes:
+            for store in args.stores:
+                result = run_game(level, mode, args.seed, args.max_ticks, args.loop_density, args.size,
+                                  store=store, store_settings=store_settings, memory=args.memory, speculate=args.speculate, trace=args.trace,
+                                  cache=args.cache, prune=not args.no_prune,
+                                  corridors=None if args.corridors is None else args.corridors == "on")
+                if args.json:
+                    print(json.dumps(result))
+                results.append(result)
+    if not args.json:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,105 @@
+# Depth-indexed ancestor structure for the parent tree of the explored cells.
+# Every node has a single jump pointer (skew-binary jump pointers, Myers 1983) which gives O(log n)
+# level-ancestor and lowest-common-ancestor queries with O(1) work per added node.
+# Re-parenting a node recomputes depth and jump pointer only for the subtree that moved.
+class AncestorIndex:
+    def __init__(self):
+        self.parents = dict()
+        self.depths = dict()
+        self.jumps = dict()
+        self.children = dict()
+
+    def __contains__(self, node):
+        return node in self.parents
+
+    # Depth and jump pointer of a node whose parent is already up to date.
+    def link(self, node, parent):
+        if parent is None:
+            self.depths[node] = 0
+            self.jumps[node] = node
+            return
+        depth = self.depths[parent] + 1
+        jump = self.jumps[parent]
+        jump_jump = self.jumps[jump]
+        if self.depths[parent] - self.depths[jump] == self.depths[jump] - self.depths[jump_jump]:
+            self.jumps[node] = jump_jump
+        else:
+            self.jumps[node] = parent
+        self.depths[node] = depth
+
+    def add(self, node, parent):
+        if node in self.parents:
+            self.reparent(node, parent)
+            return
+        self.parents[node] = parent
+        self.children[node] = []
+        if parent is not None:
+            self.children[parent].append(node)
+        self.link(node, parent)
+
+    # Removes a node that has no children.
+    def remove(self, node):
+        parent = self.parents.pop(node)
+        if parent is not None:
+            self.children[parent].remove(node)
+        del self.children[node]
+        del self.depths[node]
+        del self.jumps[node]
+
+    def reparent(self, node, parent):
+        old_parent = self.parents[node]
+        if old_parent == parent:
+            return
+        if parent is not None and self.is_ancestor(node, parent):
+            print("Error: AncestorIndex.reparent() would create a cycle.")
+            raise ValueError
+        if old_parent is not None:
+            self.children[old_parent].remove(node)
+        if parent is not None:
+            self.children[parent].append(node)
+        self.parents[node] = parent
+
+        # Refresh the moved subtree top-down so parents are always done before their children.
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            self.link(current, self.parents[current])
+            pending.extend(self.children[current])
+
+    def depth(self, node):
+        return self.depths[node]
+
+    # Ancestor of node at the given depth.
+    def level_ancestor(self, node, depth):
+        depths = self.depths
+        while depths[node] > depth:
+            jump = self.jumps[node]
+            if depths[jump] >= depth:
+                node = jump
+            else:
+                node = self.parents[node]
+        return node
+
+    def is_ancestor(self, ancestor, node):
+        return self.depths[ancestor] <= self.depths[node] and \
+            self.level_ancestor(node, self.depths[ancestor]) == ancestor
+
+    def lca(self, a, b):
+        depths = self.depths
+        if depths[a] > depths[b]:
+            a = self.level_ancestor(a, depths[b])
+        elif depths[b] > depths[a]:
+            b = self.level_ancestor(b, depths[a])
+        # Same depth means same jump structure, so jumps of a and b always land on the same depth.
+        while a != b:
+            if self.jumps[a] != self.jumps[b]:
+                a = self.jumps[a]
+                b = self.jumps[b]
+            else:
+                a = self.parents[a]
+                b = self.parents[b]
+        return a
+
+    # First step from ancestor towards its descendant node, i.e. the child of ancestor on the way to node.
+    def next_step(self, ancestor, node):
+        return self.level_ancestor(node, self.depths[ancestor] + 1)
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import time
+
+from lib.codec import decode_frame, decode_game_state, encode_command
+from lib.pacing import TickPacer
+from lib.solver import Solver
+
+BACKEND_BASE = "goldrush.monad.fi/backend"
+
+
+# One requests.Session for creating many games, keeping up to size connections to the backend alive.
+def http_session(size=1):
+    import requests
+    from requests.adapters import HTTPAdapter
+    http = requests.Session()
+    http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=size))
+    return http
+
+
+# Counterpart of the simulator's Backend.create_game for the live backend. Returns the game id.
+def create_live_game(http, level_id, token):
+    res = http.post(f"https://{BACKEND_BASE}/api/levels/{level_id}", headers={"Authorization": token})
+    if not res.ok:
+        raise RuntimeError(f"Couldn't create game: {res.status_code} - {res.text}")
+    return res.json()["entityId"]
+
+
+# One game played over a shared connection.
+# There is no speculation here (see lib.speculation, it's for main.py's single game). With many games on one
+# event loop the time a command is in flight is already spent on the other games' ticks, and a worker thread
+# would only wait for the GIL and hold up the frames of other games.
+class GameSession:
+    def __init__(self, game_id, solver=None, level=None):
+        self.game_id = game_id
+        self.solver = solver if solver is not None else Solver()
+        self.pacer = TickPacer()
+        self.ticks = 0
+        self.game_state = None
+        self.commands = None
+        self.finished = False
+        self.error = None
+        # Level the game was created for, and perf_counter() times of when it was created, subscribed to and its
+        # first game state arrived.
+        self.level = level
+        self.created = None
+        self.subscribed = None
+        self.first_tick = None
+
+    # Returns the commands for a new game tick or None if the game is over.
+    def on_game_state(self, game_state):
+        if self.first_tick is None:
+            self.first_tick = time.perf_counter()
+        self.pacer.received()
+        if game_state == self.game_state and self.commands is not None:
+            # Unchanged state means our last command was rejected (e.g. rate limited), send it again.
+            return self.commands
+        self.game_state = game_state
+        position = game_state['player']['position']
+        target = game_state['target']
+        if game_state.get('status', "IN_PROGRESS") != "IN_PROGRESS" or \
+                (position['x'], position['y']) == (target['x'], target['y']):
+            self.finished = True
+            return None
+        self.ticks += 1
+        try:
+            commands = self.solver.generate_commands(game_state)
+        except Exception as error:
+            # One broken game must not take down the rest of the connection.
+            self.error = error
+            commands = None
+        if commands is None:
+            self.finished = True
+        self.commands = commands
+        return commands
+
+    # Call once commands for the current game state have been sent.
+    def sent(self):
+        self.pacer.sent()
+
+
+# Plays many games concurrently over one connection. The connection can be a websockets client
+# connection or anything else with async send() and recv(), e.g. lib.simulator.LocalConnection.
+# Frames are routed to sessions by the entityId of the game-instance payload.
+# Games can also join while others are played: expected more sessions are taken from the arrivals queue and
+# subscribed to as soon as they come. None in the queue stands for a game that couldn't be created.
+async def play_games(connection, sessions, arrivals=None, expected=0):
+    sessions_by_id = dict()
+    running = set()
+    async def subscribe(session):
+        sessions_by_id[session.game_id] = session
+        running.add(session.game_id)
+        session.subscribed = time.perf_counter()
+        await connection.send(json.dumps(["sub-game", {"id": session.game_id}]))
+    for session in sessions:
+        await subscribe(session)
+    next_arrival = asyncio.ensure_future(arrivals.get()) if expected > 0 else None
+
+    # A session that has to back off sends later without holding up the others.
+    delayed = set()
+    async def send_later(session, message, delay):
+        await asyncio.sleep(delay)
+        await connection.send(message)
+        session.sent()
+
+    # Error frames don't say which game they are about. The backend follows a rejected command with the
+    # game's unchanged state, so the error is charged to the game whose frame arrives next.
+    pending_errors = 0
+    next_frame = None
+    while running or expected > 0:
+        if next_arrival is None:
+            if next_frame is None:
+                message = await connection.recv()
+            else:
+                message = await next_frame
+                next_frame = None
+        else:
+            if next_frame is None:
+                next_frame = asyncio.ensure_future(connection.recv())
+            done, _ = await asyncio.wait((next_frame, next_arrival), return_when=asyncio.FIRST_COMPLETED)
+            if next_arrival in done:
+                session = next_arrival.result()
+                expected -= 1
+                next_arrival = asyncio.ensure_future(arrivals.get()) if expected > 0 else None
+                if session is not None:
+                    await subscribe(session)
+            if next_frame not in done:
+                continue
+            message = next_frame.result()
+            next_frame = None
+        action, payload = decode_frame(message)
+        if action != "game-instance":
+            print([action, payload])
+            pending_errors += 1
+            continue
+
+        session = sessions_by_id.get(payload.get("entityId"))
+        if session is None or session.finished:
+            continue
+        for _ in range(pending_errors):
+            session.pacer.error()
+        pending_errors = 0
+        commands = session.on_game_state(decode_game_state(payload))
+        if commands is None:
+            running.discard(session.game_id)
+            continue
+        message = encode_command(session.game_id, commands)
+        delay = session.pacer.delay()
+        if delay > 0:
+            task = asyncio.create_task(send_later(session, message, delay))
+            delayed.add(task)
+            task.add_done_callback(delayed.discard)
+            continue
+        await connection.send(message)
+        session.sent()
+        # Let other sessions' frames in between ticks of a busy game.
+        await asyncio.sleep(0)
+    if next_frame is not None:
+        next_frame.cancel()
+    return list(sessions_by_id.values())
@@ -0,0 +1,41 @@
+import json
+
+# orjson parses a tick about 4x faster than json. It's optional, json is used when it isn't installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps(value):
+        return orjson.dumps(value).decode()
+else:
+    loads = json.loads
+
+    def dumps(value):
+        return json.dumps(value, separators=(",", ":"))
+
+
+# Splits a backend frame into (action, payload, game state). The game state is sent as a JSON string inside
+# the frame, so it is parsed here right away for game-instance frames and is None for anything else.
+def decode_tick(message):
+    [action, payload] = loads(message)
+    if action != "game-instance":
+        return action, payload, None
+    return action, payload, loads(payload["gameState"])
+
+
+# Splits a frame into (action, payload) only, for callers that first check which game the frame is for.
+def decode_frame(message):
+    [action, payload] = loads(message)
+    return action, payload
+
+
+def decode_game_state(payload):
+    return loads(payload["gameState"])
+
+
+def encode_command(game_id, commands):
+    return dumps(["run-command", {"gameId": game_id, "payload": commands}])
@@ -0,0 +1,120 @@
+import heapq
+
+from lib.planner import known_moves
+from lib.utils import chebyshevDistance
+
+
+# Ticks to follow path after its first move: a move per cell plus a rotation for every turn.
+def walk_ticks(path):
+    ticks = 0
+    for i in range(1, len(path)):
+        ticks += 1 if path[i][1] == path[i - 1][1] else 2
+    return ticks
+
+
+# Corridor-contracted view of the known maze for route planning. A corridor cell is a visited cell with exactly
+# two known moves (diagonals included); everything else (junctions, dead ends, unvisited cells) is a node.
+# A walk follows the only way on through corridor cells until it reaches a node, so searches only branch at nodes
+# and scale with the number of junctions instead of the maze area. Since there is no choice inside a corridor,
+# routes over walks cost exactly as many ticks as routes over single cells.
+# Walks are computed when first needed and cached; touch() drops the ones a new link may have changed.
+class CorridorGraph:
+    def __init__(self, cells, diagonals=True):
+        self.cells = cells
+        self.diagonals = diagonals
+        # (start cell, first move rotation) -> (cells and rotations to enter them in order, set of those cells,
+        # ticks after the first move)
+        self.walks = dict()
+        # cell -> keys of the walks starting at or going through it
+        self.through = dict()
+        # cell -> all walks from it
+        self.exits = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def walk(self, start, first, rotation):
+        key = (start, rotation)
+        walk = self.walks.get(key)
+        if walk is not None:
+            self.hits += 1
+            return walk
+        self.misses += 1
+        cells = self.cells
+        path = [(first, rotation)]
+        previous = start
+        cell = first
+        while cell != start and cell in cells and cells.visited(cell):
+            moves = known_moves(cells, cell, self.diagonals)
+            if len(moves) != 2:
+                break
+            for next_cell, next_rotation in moves.items():
+                if next_cell != previous:
+                    break
+            path.append((next_cell, next_rotation))
+            previous = cell
+            cell = next_cell
+        walk = (path, {step[0] for step in path}, walk_ticks(path))
+        self.walks[key] = walk
+        self.through.setdefault(start, set()).add(key)
+        for step in path:
+            self.through.setdefault(step[0], set()).add(key)
+        return walk
+
+    # Walks from cell, one per known move.
+    def walks_from(self, cell):
+        walks = self.exits.get(cell)
+        if walks is None:
+            walks = [self.walk(cell, neighbour, rotation)
+                     for neighbour, rotation in known_moves(self.cells, cell, self.diagonals).items()]
+            self.exits[cell] = walks
+        return walks
+
+    # Call when cell got a new link: drops the walks through it and its neighbours, whose diagonals may have changed.
+    def touch(self, cell):
+        for dx, dy in ((0, 0), (0, -1), (1, 0), (0, 1), (-1, 0)):
+            near = (cell[0] + dx, cell[1] + dy)
+            self.exits.pop(near, None)
+            for key in self.through.pop(near, ()):
+                self.walks.pop(key, None)
+                self.exits.pop(key[0], None)
+
+    def clear(self):
+        self.walks.clear()
+        self.through.clear()
+        self.exits.clear()
+
+    # Same as planner.find_route, but searches over walks. Returns (cost, [(cell, rotation needed to enter it)])
+    # or None if no route to goal is known.
+    def find_route(self, position, rotation, goal):
+        target = {'x': goal[0], 'y': goal[1]}
+        start = (position, rotation)
+        costs = {start: 0}
+        came_from = {start: None}
+        counter = 0
+        open_set = [(chebyshevDistance(position, target), counter, 0, start)]
+        while open_set:
+            _, _, cost, state = heapq.heappop(open_set)
+            if cost > costs[state]:
+                continue
+            cell, heading = state
+            if cell == goal:
+                route = list()
+                while came_from[state] is not None:
+                    state, steps = came_from[state]
+                    route.extend(reversed(steps))
+                route.reverse()
+                return cost, route
+            for path, path_cells, ticks in self.walks_from(cell):
+                if goal in path_cells:
+                    # Stop the walk at goal.
+                    path = path[:next(i for i, step in enumerate(path) if step[0] == goal) + 1]
+                    ticks = walk_ticks(path)
+                new_cost = cost + ticks + (1 if path[0][1] == heading else 2)
+                end = path[-1][0]
+                new_state = (end, path[-1][1])
+                if new_cost < costs.get(new_state, new_cost + 1):
+                    costs[new_state] = new_cost
+                    came_from[new_state] = (state, path)
+                    counter += 1
+                    heapq.heappush(open_set, (new_cost + chebyshevDistance(end, target), counter, new_cost, new_state))
+        return None
@@ -0,0 +1,119 @@
+# Single-threaded binary min-heap keyed by cell, with decrease-key. Every key is in the heap at most once,
+# so no stale entries pile up. Entries are (priority, key) tuples, ties are broken by key like with PriorityQueue.
+# While journal is a list, every change appends its inverse as (function, *args) so it can be rolled back.
+class IndexedHeap:
+    def __init__(self):
+        self.heap = list()
+        self.index = dict()
+        # Counters for seeing the open-set footprint.
+        self.pushes = 0
+        self.decreases = 0
+        self.rejected = 0
+        self.pops = 0
+        self.peak_size = 0
+        self.journal = None
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    # Inserts key, or lowers its priority if it is already in the heap. Pushing a priority that is not
+    # lower than the current one is ignored.
+    def push(self, key, priority):
+        i = self.index.get(key)
+        if i is None:
+            if self.journal is not None:
+                self.journal.append((self.remove, key))
+            self.pushes += 1
+            self.heap.append((priority, key))
+            self.index[key] = len(self.heap) - 1
+            self.sift_up(len(self.heap) - 1)
+            if len(self.heap) > self.peak_size:
+                self.peak_size = len(self.heap)
+        elif (priority, key) < self.heap[i]:
+            if self.journal is not None:
+                self.journal.append((self.set_priority, key, self.heap[i][0]))
+            self.decreases += 1
+            self.heap[i] = (priority, key)
+            self.sift_up(i)
+        else:
+            self.rejected += 1
+
+    def peek(self):
+        return self.heap[0]
+
+    def pop(self):
+        self.pops += 1
+        top = self.heap[0]
+        if self.journal is not None:
+            self.journal.append((self.push, top[1], top[0]))
+        last = self.heap.pop()
+        del self.index[top[1]]
+        if self.heap:
+            self.heap[0] = last
+            self.index[last[1]] = 0
+            self.sift_down(0)
+        return top
+
+    def remove(self, key):
+        i = self.index.pop(key)
+        if self.journal is not None:
+            self.journal.append((self.push, key, self.heap[i][0]))
+        last = self.heap.pop()
+        if i < len(self.heap):
+            self.heap[i] = last
+            self.index[last[1]] = i
+            self.sift_up(i)
+            self.sift_down(self.index[last[1]])
+
+    # Sets the priority of a key in the heap, higher or lower.
+    def set_priority(self, key, priority):
+        i = self.index[key]
+        self.heap[i] = (priority, key)
+        self.sift_up(i)
+        self.sift_down(self.index[key])
+
+    def sift_up(self, i):
+        heap = self.heap
+        entry = heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if entry < heap[parent]:
+                heap[i] = heap[parent]
+                self.index[heap[i][1]] = i
+                i = parent
+            else:
+                break
+        heap[i] = entry
+        self.index[entry[1]] = i
+
+    def sift_down(self, i):
+        heap = self.heap
+        size = len(heap)
+        entry = heap[i]
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if heap[child] < entry:
+                heap[i] = heap[child]
+                self.index[heap[i][1]] = i
+                i = child
+            else:
+                break
+        heap[i] = entry
+        self.index[entry[1]] = i
+
+    def stats(self):
+        return {
+            "size": len(self.heap),
+            "peak_size": self.peak_size,
+            "pushes": self.pushes,
+            "decreases": self.decreases,
+            "rejected": self.rejected,
+            "pops": self.pops,
+        }
@@ -0,0 +1,97 @@
+import mmap
+import os
+import struct
+
+from lib.maze import ORTHOGONAL
+
+MAGIC = b"GRMZ"
+HEADER = struct.Struct("<4sHH")
+# Per cell byte: the square value in the low four bits and SEEN once the player has stood on the cell.
+SEEN = 0x10
+
+
+# Walls seen on earlier runs of the same maze, kept in a memory-mapped file with one byte per cell so
+# knowledge is written to disk as it is discovered and survives crashes.
+# The file is keyed by level and the maze fingerprint (size, start and target). Every observed square is
+# checked against the file and a difference wipes it, because then the maze is not the one that was cached.
+class MazeCache:
+    def __init__(self, directory, level):
+        self.directory = directory
+        self.level = level
+        self.path = None
+        self.file = None
+        self.cells = None
+        self.width = 0
+        self.height = 0
+        self.invalidations = 0
+
+    def open(self, game_state):
+        self.width = game_state['columns']
+        self.height = game_state['rows']
+        start = game_state['start']
+        target = game_state['target']
+        name = f"{self.level}-{self.width}x{self.height}-{start['x']}_{start['y']}-{target['x']}_{target['y']}.maze"
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, name)
+        size = HEADER.size + self.width * self.height
+        header = HEADER.pack(MAGIC, self.width, self.height)
+        self.file = open(self.path, "r+b" if os.path.exists(self.path) else "w+b")
+        if os.path.getsize(self.path) != size or self.file.read(HEADER.size) != header:
+            # Not the cache of this maze, even if the size happens to match: start from empty cells.
+            self.file.seek(0)
+            self.file.truncate(0)
+            self.file.write(header + bytes(self.width * self.height))
+            self.file.flush()
+        self.cells = mmap.mmap(self.file.fileno(), size)
+
+    # Known square of a position or None.
+    def square(self, position):
+        value = self.cells[HEADER.size + position[1] * self.width + position[0]]
+        return value & 0xf if value & SEEN else None
+
+    # Records the square of the player's cell. Returns False if it contradicts the cell or the walls its seen
+    # neighbours share with it, the cache is wiped then.
+    def observe(self, game_state):
+        if self.cells is None:
+            self.open(game_state)
+        cells = self.cells
+        x = game_state['player']['position']['x']
+        y = game_state['player']['position']['y']
+        i = HEADER.size + y * self.width + x
+        value = cells[i]
+        square = game_state['square']
+        if value & SEEN:
+            if value & 0xf == square:
+                return True
+            self.invalidate()
+            cells[i] = SEEN | square
+            return False
+
+        for wall, dx, dy, opposite in ORTHOGONAL.values():
+            if 0 <= x + dx < self.width and 0 <= y + dy < self.height:
+                neighbour = cells[i + dy * self.width + dx]
+                if neighbour & SEEN and (neighbour & opposite == 0) != (square & wall == 0):
+                    self.invalidate()
+                    cells[i] = SEEN | square
+                    return False
+        cells[i] = SEEN | square
+        return True
+
+    def invalidate(self):
+        self.invalidations += 1
+        self.cells[HEADER.size:] = bytes(self.width * self.height)
+
+    # Squares of all seen cells.
+    def known(self):
+        known = dict()
+        for i, value in enumerate(self.cells[HEADER.size:]):
+            if value & SEEN:
+                known[(i % self.width, i // self.width)] = value & 0xf
+        return known
+
+    def close(self):
+        if self.cells is not None:
+            self.cells.flush()
+            self.cells.close()
+            self.file.close()
+            self.cells = None
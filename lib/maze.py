@@ -0,0 +1,103 @@
+import random
+
+# Wall bits as served by the backend in game_state['square'].
+NORTH = 0b1000
+EAST = 0b0100
+SOUTH = 0b0010
+WEST = 0b0001
+
+# Orthogonal rotation -> (wall bit, x offset, y offset, wall bit on the other side).
+ORTHOGONAL = {
+    0: (NORTH, 0, -1, SOUTH),
+    90: (EAST, 1, 0, WEST),
+    180: (SOUTH, 0, 1, NORTH),
+    270: (WEST, -1, 0, EAST),
+}
+
+# Diagonal rotation -> the two orthogonal rotations it is made of.
+DIAGONAL = {
+    45: (0, 90),
+    135: (180, 90),
+    225: (180, 270),
+    315: (0, 270),
+}
+
+
+# A rectangular maze. Walls of each cell are stored as the same 4-bit value the backend sends.
+class Maze:
+    def __init__(self, width, height, walls, start, target):
+        self.width = width
+        self.height = height
+        self.walls = walls
+        self.start = start
+        self.target = target
+
+    def square(self, position):
+        return self.walls[position[1] * self.width + position[0]]
+
+    def inside(self, position):
+        return 0 <= position[0] < self.width and 0 <= position[1] < self.height
+
+    # Returns the cell reached by moving from position towards rotation or None if the way is blocked.
+    # Diagonal moves are allowed when either of the two L-shaped routes around the corner is open.
+    def step(self, position, rotation):
+        if rotation in ORTHOGONAL:
+            wall, dx, dy, _ = ORTHOGONAL[rotation]
+            if self.square(position) & wall:
+                return None
+            return (position[0] + dx, position[1] + dy)
+        if rotation in DIAGONAL:
+            first, second = DIAGONAL[rotation]
+            for a, b in ((first, second), (second, first)):
+                middle = self.step(position, a)
+                if middle is not None and self.step(middle, b) is not None:
+                    return self.step(middle, b)
+        return None
+
+    def remove_wall(self, position, rotation):
+        wall, dx, dy, opposite = ORTHOGONAL[rotation]
+        other = (position[0] + dx, position[1] + dy)
+        self.walls[position[1] * self.width + position[0]] &= ~wall
+        self.walls[other[1] * self.width + other[0]] &= ~opposite
+
+
+# Generates a seeded maze with an iterative recursive backtracker.
+# loop_density is the probability of knocking down each remaining inner wall, which adds loops to the maze.
+def generate_maze(width, height, seed=None, loop_density=0.0):
+    rng = random.Random(seed)
+    maze = Maze(width, height, bytearray([0b1111]) * (width * height), None, None)
+
+    visited = bytearray(width * height)
+    start_cell = (rng.randrange(width), rng.randrange(height))
+    visited[start_cell[1] * width + start_cell[0]] = 1
+    stack = [start_cell]
+    while stack:
+        x, y = stack[-1]
+        options = []
+        for rotation, (_, dx, dy, _) in ORTHOGONAL.items():
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and not visited[ny * width + nx]:
+                options.append((rotation, nx, ny))
+        if not options:
+            stack.pop()
+            continue
+        rotation, nx, ny = options[rng.randrange(len(options))]
+        maze.remove_wall((x, y), rotation)
+        visited[ny * width + nx] = 1
+        stack.append((nx, ny))
+
+    if loop_density > 0:
+        for y in range(height):
+            for x in range(width):
+                square = maze.walls[y * width + x]
+                if x + 1 < width and square & EAST and rng.random() < loop_density:
+                    maze.remove_wall((x, y), 90)
+                if y + 1 < height and square & SOUTH and rng.random() < loop_density:
+                    maze.remove_wall((x, y), 180)
+
+    # Start and target are placed in opposite halves of the maze so the run is never trivial.
+    maze.start = (rng.randrange(max(1, width // 2)), rng.randrange(height))
+    maze.target = (width - 1 - rng.randrange(max(1, width // 2)), rng.randrange(height))
+    if maze.start == maze.target:
+        maze.target = (width - 1 - maze.start[0], height - 1 - maze.start[1])
+    return maze
@@ -0,0 +1,61 @@
+import time
+from collections import deque
+
+
+# Paces run-command messages by what the server actually accepts instead of a fixed sleep.
+# Commands are sent as soon as the next game-instance arrives. Error frames (e.g. rate limiting) set a minimum
+# interval between commands which doubles on every error and shrinks back towards zero on error-free ticks.
+class TickPacer:
+    def __init__(self, initial_backoff=0.01, max_backoff=2.0, recovery=0.9, window=100):
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.recovery = recovery
+        self.min_interval = 0.0
+        self.last_sent = None
+        self.rtt = None
+        self.ticks = 0
+        self.errors = 0
+        self.arrivals = deque(maxlen=window)
+
+    # Seconds to wait before the next command may be sent.
+    def delay(self):
+        if self.last_sent is None or self.min_interval == 0:
+            return 0
+        return max(0.0, self.last_sent + self.min_interval - time.perf_counter())
+
+    def sent(self):
+        self.last_sent = time.perf_counter()
+
+    # A game-instance arrived, i.e. the previous command was accepted.
+    def received(self):
+        now = time.perf_counter()
+        self.ticks += 1
+        self.arrivals.append(now)
+        if self.last_sent is not None:
+            rtt = now - self.last_sent
+            self.rtt = rtt if self.rtt is None else 0.9 * self.rtt + 0.1 * rtt
+        if self.min_interval:
+            self.min_interval *= self.recovery
+            if self.min_interval < self.initial_backoff / 10:
+                self.min_interval = 0.0
+
+    # The server answered with something else than a game-instance, e.g. a rate limit or error frame.
+    def error(self):
+        self.errors += 1
+        self.min_interval = min(self.max_backoff, max(self.initial_backoff, self.min_interval * 2))
+
+    # Observed ticks per second over the last window of ticks.
+    def tick_rate(self):
+        if len(self.arrivals) < 2:
+            return 0.0
+        elapsed = self.arrivals[-1] - self.arrivals[0]
+        return (len(self.arrivals) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "tick_rate": self.tick_rate(),
+            "rtt_ms": None if self.rtt is None else self.rtt * 1000,
+            "min_interval_ms": self.min_interval * 1000,
+            "errors": self.errors,
+        }
@@ -0,0 +1,130 @@
+import heapq
+from collections import deque
+
+from lib.utils import chebyshevDistance
+
+# Diagonal rotation and the two orthogonal rotations it is made of.
+DIAGONALS = ((45, 0, 90), (135, 180, 90), (225, 180, 270), (315, 0, 270))
+OFFSETS = {0: (0, -1), 90: (1, 0), 180: (0, 1), 270: (-1, 0)}
+
+
+# Moves known to be possible from cell: its links plus the diagonals that are open, i.e. those where one of the
+# two L-shaped routes around the corner is made of known orthogonal links.
+def known_moves(cells, cell, diagonals=True):
+    moves = cells.neighbours(cell)
+    if not diagonals:
+        return moves
+    moves = dict(moves)
+    for rotation, a, b in DIAGONALS:
+        corner = (cell[0] + OFFSETS[a][0] + OFFSETS[b][0], cell[1] + OFFSETS[a][1] + OFFSETS[b][1])
+        if corner in moves or corner not in cells:
+            continue
+        for first, second in ((a, b), (b, a)):
+            middle = (cell[0] + OFFSETS[first][0], cell[1] + OFFSETS[first][1])
+            if moves.get(middle) == first and cells.neighbour_rotation(middle, corner) == second:
+                moves[corner] = rotation
+                break
+    return moves
+
+
+# Cheapest known route from position (facing rotation) to goal. A move, diagonal or not, and a rotation cost one
+# tick each, so searched states are (cell, rotation) pairs. Returns (cost, route) where route is a list of
+# (cell, rotation needed to enter it), or None if no route is known.
+def find_route(cells, position, rotation, goal, diagonals=True):
+    target = {'x': goal[0], 'y': goal[1]}
+    start = (position, rotation)
+    costs = {start: 0}
+    came_from = {start: None}
+    counter = 0
+    open_set = [(chebyshevDistance(position, target), counter, 0, start)]
+    while open_set:
+        _, _, cost, state = heapq.heappop(open_set)
+        if cost > costs[state]:
+            continue
+        cell, heading = state
+        if cell == goal:
+            route = list()
+            while came_from[state] is not None:
+                route.append(state)
+                state = came_from[state]
+            route.reverse()
+            return cost, route
+        for neighbour, neighbour_rotation in known_moves(cells, cell, diagonals).items():
+            if neighbour not in cells:
+                continue
+            new_cost = cost + 1 if neighbour_rotation == heading else cost + 2
+            new_state = (neighbour, neighbour_rotation)
+            if new_cost < costs.get(new_state, new_cost + 1):
+                costs[new_state] = new_cost
+                came_from[new_state] = state
+                counter += 1
+                heapq.heappush(open_set, (new_cost + chebyshevDistance(neighbour, target), counter, new_cost, new_state))
+    return None
+
+
+# Compiles the minimal-tick route over the known map into the exact command sequence to send, one per tick.
+# With a lib.corridors.CorridorGraph the route is searched over corridors instead of single cells.
+def compile_route(cells, position, rotation, goal, diagonals=True, corridors=None):
+    if corridors is not None:
+        result = corridors.find_route(position, rotation, goal)
+    else:
+        result = find_route(cells, position, rotation, goal, diagonals)
+    if result is None:
+        return None
+    commands = deque()
+    heading = rotation
+    for cell, cell_rotation in result[1]:
+        if cell_rotation != heading:
+            commands.append({ "action": "rotate", "rotation": cell_rotation })
+            heading = cell_rotation
+        commands.append({ "action": "move" })
+    return commands
+
+
+# Plans the cheapest known route from the current position to a goal cell over every link discovered so far.
+# The plan is cached and reused tick after tick until the goal changes, we end up somewhere unexpected or
+# new links are discovered (links are only ever added, so an old plan stays valid but may no longer be the cheapest).
+class RoutePlanner:
+    def __init__(self, cells, diagonals=True, corridors=None):
+        self.cells = cells
+        self.diagonals = diagonals
+        self.corridors = corridors
+        self.goal = None
+        self.route = list()
+        self.index = 0
+        self.expected_position = None
+        self.version = -1
+        self.replans = 0
+        self.reuses = 0
+
+    def plan(self, position, rotation, goal):
+        if self.corridors is not None:
+            return self.corridors.find_route(position, rotation, goal)
+        return find_route(self.cells, position, rotation, goal, self.diagonals)
+
+    # Returns the command that takes us one tick further along the cheapest known route to goal,
+    # or None if no route to goal is known.
+    def next_command(self, position, rotation, goal):
+        if goal != self.goal or position != self.expected_position or self.version != self.cells.version \
+                or self.index >= len(self.route):
+            result = self.plan(position, rotation, goal)
+            if result is None:
+                self.goal = None
+                return None
+            if not result[1]:
+                return None
+            self.route = result[1]
+            self.index = 0
+            self.goal = goal
+            self.version = self.cells.version
+            self.replans += 1
+        else:
+            self.reuses += 1
+
+        next_cell, next_rotation = self.route[self.index]
+        self.expected_position = position
+        if rotation != next_rotation:
+            return { "action": "rotate", "rotation": next_rotation }
+        self.index += 1
+        self.expected_position = next_cell
+        return { "action": "move" }
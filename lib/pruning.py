@@ -0,0 +1,92 @@
+# Unexplored space is every cell of the maze that has not been visited. Its walls are only known from visited
+# cells, so two unexplored cells next to each other are connected as far as we know. Visiting a cell can cut a
+# piece of unexplored space off from the rest. If that piece doesn't hold the target, nothing in it can lead
+# there anymore and its frontier cells can be dropped.
+
+# The 8 cells around a cell in ring order, orthogonal ones marked True.
+RING = ((0, -1, True), (1, -1, False), (1, 0, True), (1, 1, False),
+        (0, 1, True), (-1, 1, False), (-1, 0, True), (-1, -1, False))
+ORTHOGONAL_OFFSETS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+
+def unexplored(cells, dead, size, cell):
+    if not (0 <= cell[0] < size[0] and 0 <= cell[1] < size[1]):
+        return False
+    if cell in dead:
+        return False
+    return cell not in cells or not cells.visited(cell)
+
+
+# Unexplored orthogonal neighbours of a just visited cell, one per group of them that are not connected around
+# the cell. Only when there are two or more groups can visiting the cell have split unexplored space.
+def split_seeds(cells, dead, size, position):
+    ring = [(unexplored(cells, dead, size, (position[0] + dx, position[1] + dy)), (position[0] + dx, position[1] + dy),
+             orthogonal) for dx, dy, orthogonal in RING]
+    # Start walking the ring right after a blocked cell so no group wraps around the end.
+    start = next((i + 1 for i, entry in enumerate(ring) if not entry[0]), None)
+    if start is None:
+        return list()
+    seeds = list()
+    seed = None
+    for i in range(len(ring)):
+        is_open, cell, orthogonal = ring[(start + i) % len(ring)]
+        if not is_open:
+            if seed is not None:
+                seeds.append(seed)
+            seed = None
+        elif orthogonal and seed is None:
+            seed = cell
+    if seed is not None:
+        seeds.append(seed)
+    return seeds
+
+
+# Regions of unexplored space cut off by visiting position that don't hold goal. The regions around position are
+# flooded in lock-step, one cell each per round, so a small pocket is found without walking a big open region.
+# A flood is given up (the region counts as open) when it reaches goal, runs into another flood or grows past
+# budget cells. Once all other regions turned out to be enclosed the last one must hold the goal, so it isn't walked.
+def enclosed_regions(cells, dead, size, position, goal, budget=4096):
+    seeds = split_seeds(cells, dead, size, position)
+    if len(seeds) < 2:
+        return list()
+    owner = dict()
+    floods = list()
+    for seed in seeds:
+        owner[seed] = len(floods)
+        floods.append({"cells": [seed], "next": 0, "state": "open" if seed == goal else "running"})
+    goal_found = goal in owner
+
+    while True:
+        running = [i for i, flood in enumerate(floods) if flood["state"] == "running"]
+        if not running:
+            break
+        if len(running) == 1 and not goal_found and \
+                all(flood["state"] == "enclosed" for i, flood in enumerate(floods) if i != running[0]):
+            break
+        for i in running:
+            flood = floods[i]
+            if flood["state"] != "running":
+                continue
+            if flood["next"] == len(flood["cells"]):
+                flood["state"] = "enclosed"
+                continue
+            cell = flood["cells"][flood["next"]]
+            flood["next"] += 1
+            for dx, dy in ORTHOGONAL_OFFSETS:
+                neighbour = (cell[0] + dx, cell[1] + dy)
+                if neighbour == position or not unexplored(cells, dead, size, neighbour):
+                    continue
+                other = owner.get(neighbour)
+                if other is None:
+                    owner[neighbour] = i
+                    flood["cells"].append(neighbour)
+                    if neighbour == goal:
+                        goal_found = True
+                        flood["state"] = "open"
+                elif other != i:
+                    # Same region as another flood, leave both be.
+                    flood["state"] = "open"
+                    floods[other]["state"] = "open"
+            if flood["state"] == "running" and len(flood["cells"]) > budget:
+                flood["state"] = "open"
+    return [flood["cells"] for flood in floods if flood["state"] == "enclosed"]
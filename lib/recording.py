@@ -0,0 +1,121 @@
+import gzip
+import json
+import time
+
+from lib.maze import Maze, ORTHOGONAL
+
+IN = "in"
+OUT = "out"
+
+
+# Writes every frame of a connection to a gzipped JSON lines file: a header line with free-form info,
+# then one [ms since start, "in" or "out", message] line per frame. Messages are kept as the exact strings sent.
+class Recorder:
+    def __init__(self, path, info=None):
+        self.file = gzip.open(path, "wt")
+        self.start = time.perf_counter()
+        self.frames = 0
+        self.file.write(json.dumps({"recording": 1, "info": info or {}}) + "\n")
+
+    def write(self, direction, message):
+        t = round((time.perf_counter() - self.start) * 1000, 3)
+        self.file.write(json.dumps([t, direction, message], separators=(",", ":")) + "\n")
+        self.frames += 1
+
+    def received(self, message):
+        self.write(IN, message)
+
+    def sent(self, message):
+        self.write(OUT, message)
+
+    def close(self):
+        self.file.close()
+
+
+# Async connection wrapper that records everything going through it, for lib.client.play_games.
+class RecordingConnection:
+    def __init__(self, connection, recorder):
+        self.connection = connection
+        self.recorder = recorder
+
+    async def send(self, message):
+        self.recorder.sent(message)
+        await self.connection.send(message)
+
+    async def recv(self):
+        message = await self.connection.recv()
+        self.recorder.received(message)
+        return message
+
+
+# Returns (info, frames) of a recording.
+def load_recording(path):
+    with gzip.open(path, "rt") as file:
+        header = json.loads(file.readline())
+        frames = [json.loads(line) for line in file]
+    return header["info"], frames
+
+
+# Game states of one game in the order they arrived. game_id can be left out if only one game was recorded.
+def recorded_states(frames, game_id=None):
+    states = list()
+    for _, direction, message in frames:
+        if direction != IN:
+            continue
+        [action, payload] = json.loads(message)
+        if action != "game-instance":
+            continue
+        if game_id is None:
+            game_id = payload["entityId"]
+        if payload["entityId"] == game_id:
+            states.append(json.loads(payload["gameState"]))
+    return states
+
+
+# Commands we sent for one game in the order they were sent.
+def recorded_commands(frames, game_id=None):
+    commands = list()
+    for _, direction, message in frames:
+        if direction != OUT:
+            continue
+        [action, payload] = json.loads(message)
+        if action == "run-command" and (game_id is None or payload["gameId"] == game_id):
+            commands.append(payload["payload"])
+    return commands
+
+
+def recorded_game_ids(frames):
+    game_ids = list()
+    for _, direction, message in frames:
+        [action, payload] = json.loads(message)
+        if direction == IN and action == "game-instance" and payload["entityId"] not in game_ids:
+            game_ids.append(payload["entityId"])
+    return game_ids
+
+
+# Rebuilds the maze from the square of every cell the player stood on.
+# Cells that were never seen are closed off, except for the walls they share with seen cells,
+# so replaying the recorded commands gives the same game states again.
+def reconstruct_maze(states):
+    first = states[0]
+    width = first['columns']
+    height = first['rows']
+    walls = bytearray([0b1111]) * (width * height)
+    seen = bytearray(width * height)
+    for state in states:
+        position = state['player']['position']
+        index = position['y'] * width + position['x']
+        walls[index] = state['square']
+        seen[index] = 1
+
+    maze = Maze(width, height, walls, (first['start']['x'], first['start']['y']),
+                (first['target']['x'], first['target']['y']))
+    for y in range(height):
+        for x in range(width):
+            if not seen[y * width + x]:
+                continue
+            for rotation, (wall, dx, dy, opposite) in ORTHOGONAL.items():
+                other = (x + dx, y + dy)
+                if not walls[y * width + x] & wall and maze.inside(other) and not seen[other[1] * width + other[0]]:
+                    walls[other[1] * width + other[0]] &= ~opposite
+    return maze
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import itertools
+import time
+
+from lib.maze import generate_maze
+
+# Maze sizes and loop densities used to stand in for the real levels.
+LEVELS = {
+    1: (10, 10, 0.0),
+    2: (25, 25, 0.02),
+    3: (50, 50, 0.05),
+    4: (100, 100, 0.05),
+    5: (200, 200, 0.05),
+    6: (500, 500, 0.05),
+    7: (1000, 1000, 0.05),
+}
+
+
+# A single game running in the simulator.
+class Game:
+    def __init__(self, entity_id, maze):
+        self.entity_id = entity_id
+        self.maze = maze
+        self.position = maze.start
+        self.rotation = 0
+        self.timer = 0
+        self.score = 0
+        self.status = "IN_PROGRESS"
+        self.last_command = None
+
+    def game_state(self):
+        return {
+            "player": {
+                "position": {"x": self.position[0], "y": self.position[1]},
+                "rotation": self.rotation,
+            },
+            "start": {"x": self.maze.start[0], "y": self.maze.start[1]},
+            "target": {"x": self.maze.target[0], "y": self.maze.target[1]},
+            "square": self.maze.square(self.position),
+            "columns": self.maze.width,
+            "rows": self.maze.height,
+            "timer": self.timer,
+            "score": self.score,
+            "status": self.status,
+        }
+
+    # Applies a command. Returns an error string if the command was invalid.
+    def run_command(self, command):
+        if self.status != "IN_PROGRESS":
+            return "Game is not in progress"
+        if not isinstance(command, dict):
+            return "Invalid command"
+        action = command.get("action")
+        error = None
+        if action == "move":
+            new_position = self.maze.step(self.position, self.rotation)
+            if new_position is None:
+                error = "Can't move through a wall"
+            else:
+                self.position = new_position
+        elif action == "rotate":
+            rotation = command.get("rotation")
+            if rotation not in (0, 45, 90, 135, 180, 225, 270, 315):
+                return "Invalid rotation"
+            self.rotation = rotation
+        elif action == "reset":
+            self.position = self.maze.start
+            self.rotation = 0
+            self.score = -1  # The reset tick itself is not part of the score.
+        else:
+            return "Invalid action"
+
+        self.timer += 1
+        self.score += 1
+        if self.position == self.maze.target:
+            self.status = "FINISHED"
+        return error
+
+
+# Offline stand-in for the goldrush backend. Speaks the same sub-game / game-instance / run-command
+# protocol as the real websocket, but messages are passed in and out as strings by the caller.
+# With rate_limit set, commands arriving less than rate_limit seconds apart are rejected with an error frame.
+class Backend:
+    def __init__(self, rate_limit=None):
+        self.games = dict()
+        self.ids = itertools.count(1)
+        self.rate_limit = rate_limit
+
+    # Counterpart of POST /api/levels/{level}. Returns the same kind of body as the real backend.
+    def create_game(self, level, seed=None, loop_density=None, size=None):
+        width, height, density = LEVELS[level]
+        if size is not None:
+            width, height = size
+        if loop_density is not None:
+            density = loop_density
+        maze = generate_maze(width, height, seed=seed, loop_density=density)
+        return self.add_game(maze)
+
+    def add_game(self, maze):
+        entity_id = f"sim-{next(self.ids)}"
+        self.games[entity_id] = Game(entity_id, maze)
+        return {"entityId": entity_id}
+
+    def game_instance(self, game):
+        return json.dumps(["game-instance", {"entityId": game.entity_id, "gameState": json.dumps(game.game_state())}])
+
+    # Handles one incoming message and returns the list of messages the backend sends back.
+    def handle(self, message):
+        [action, payload] = json.loads(message)
+        if action == "sub-game":
+            game = self.games.get(payload.get("id"))
+            if game is None:
+                return [json.dumps(["error", {"message": "Game not found"}])]
+            return [self.game_instance(game)]
+
+        if action == "run-command":
+            game = self.games.get(payload.get("gameId"))
+            if game is None:
+                return [json.dumps(["error", {"message": "Game not found"}])]
+            if game.status != "IN_PROGRESS":
+                return []
+            if self.rate_limit is not None:
+                now = time.perf_counter()
+                if game.last_command is not None and now - game.last_command < self.rate_limit:
+                    return [json.dumps(["error", {"message": "Too many requests"}]), self.game_instance(game)]
+                game.last_command = now
+            error = game.run_command(payload.get("payload"))
+            messages = []
+            if error is not None:
+                messages.append(json.dumps(["error", {"message": error}]))
+            messages.append(self.game_instance(game))
+            return messages
+
+        return [json.dumps(["error", {"message": f"Unknown action {action}"}])]
+
+
+# Async connection to an in-process Backend, a drop-in for a websockets client connection.
+# delay simulates the network round trip of each message in seconds.
+class LocalConnection:
+    def __init__(self, backend, delay=0):
+        self.backend = backend
+        self.delay = delay
+        self.incoming = asyncio.Queue()
+
+    async def send(self, message):
+        for response in self.backend.handle(message):
+            if self.delay:
+                asyncio.get_running_loop().call_later(self.delay, self.incoming.put_nowait, response)
+            else:
+                self.incoming.put_nowait(response)
+
+    async def recv(self):
+        return await self.incoming.get()
@@ -0,0 +1,557 @@
+import heapq
+
+import lib.utils
+from lib.corridors import CorridorGraph
+from lib.heap import IndexedHeap
+from lib.planner import RoutePlanner, compile_route, known_moves
+from lib.pruning import enclosed_regions
+from lib.store import GridStore
+from lib.trace import Tracer
+
+from collections import deque
+
+
+# All search state of a single game. One Solver per game, so one process can drive many games at once.
+class Solver:
+    def __init__(self, use_DFS=True, use_heuristics_in_dfs=True, dist_traveled_factor=0.2, dist_to_go_factor=1,
+                 store=GridStore, use_route_planner=True, tracer=None, knowledge=None, use_frontier=False,
+                 use_pruning=True, use_corridors=None):
+        # Everything known about the maze: links, visited flags, parents, costs and estimates per cell.
+        self.store = store
+        self.cells = store()
+        # Routes are searched over corridors, junction to junction, rather than over single cells. None turns it on
+        # for A*, which travels between far-apart open cells all the time. DFS and frontier mostly plan short hops
+        # next to fresh links, where walks are dropped again before they pay off.
+        if use_corridors is None:
+            use_corridors = not use_DFS and not use_frontier
+        self.use_corridors = use_corridors
+        self.corridors = CorridorGraph(self.cells) if use_corridors else None
+        # Travels to non-adjacent cells over all known links instead of backtracking along the parent tree.
+        self.planner = RoutePlanner(self.cells, corridors=self.corridors)
+        self.use_route_planner = use_route_planner
+        # Log levels, phase timers and counters. Pass Tracer("off") to silence the solver.
+        self.tracer = tracer if tracer is not None else Tracer()
+        # Walls cached from earlier runs of the same maze (lib.knowledge.MazeCache), or None.
+        self.knowledge = knowledge
+        # Whether the store was filled from the cache, only then a wrong cache means the store is wrong too.
+        self.knowledge_loaded = False
+        # Start cell of the game, the compiled route is run from here after the reset.
+        self.start = None
+        self.stack = list()
+        # A* open set.
+        self.prio_queue = IndexedHeap()
+        # Precompiled commands from the start to the target, sent one per tick after the reset.
+        self.commands = deque()
+        self.shortest_path_found = False
+        self.path_optimized = False
+        self.expected_position = None
+        self.dist_traveled_factor = dist_traveled_factor
+        self.dist_to_go_factor = dist_to_go_factor
+        self.use_DFS = use_DFS
+        self.use_heuristics_in_dfs = use_heuristics_in_dfs
+        # Third search mode: go to the frontier cell with the lowest travel cost from here plus estimate to target.
+        # Overrides use_DFS. prio_queue then holds the frontier keyed by estimate.
+        self.use_frontier = use_frontier
+        self.frontier_goal = None
+        # Drop frontier cells of unexplored regions that can't lead to the target, see lib.pruning.
+        self.use_pruning = use_pruning
+        # Unexplored cells in such regions and the (columns, rows) of the maze.
+        self.dead = set()
+        self.maze_size = None
+        # Inverses of the changes made since checkpoint(), None when not recording.
+        self.journal = None
+        self.saved_state = None
+
+    def generate_commands(self, game_state):
+        tracer = self.tracer
+        outer_phase = tracer.switch("search")
+        tracer.debug("\n%s", game_state)
+        if self.knowledge is not None:
+            # observe() wipes the file when it is wrong. The store only needs to go as well if it came from the file,
+            # everything we found out ourselves is still right.
+            if not self.knowledge.observe(game_state):
+                if self.knowledge_loaded:
+                    tracer.info("CACHED MAZE DIFFERS, EXPLORING FROM SCRATCH")
+                    self.forget()
+            elif self.knowledge_loaded and self.path_optimized and self.expected_position is not None and \
+                    self.expected_position != (game_state['player']['position']['x'], game_state['player']['position']['y']):
+                # A move of the route didn't get through, so the route went through a wall that the cache got wrong.
+                tracer.info("CACHED ROUTE BLOCKED, EXPLORING FROM SCRATCH")
+                self.knowledge.invalidate()
+                self.forget()
+        cells = self.cells
+
+        # Assume backend serves correct game state.
+        position = game_state['player']['position']
+        position = ( position['x'], position['y'] )
+        target = game_state['target']
+        rotation = game_state['player']['rotation']
+        square = game_state['square']
+        self.start = (game_state['start']['x'], game_state['start']['y'])
+        if 'columns' in game_state:
+            self.maze_size = (game_state['columns'], game_state['rows'])
+
+        # Go straight to the route compiler if the cached maze already has a way to the target.
+        if len(cells) == 0 and self.knowledge is not None and self.load_knowledge(position, target):
+            tracer.info("TARGET KNOWN FROM CACHE, cells: %s", len(cells))
+
+        # Initialize algorithms.
+        if len(cells) == 0:
+            cells.add( position, None, 0, self.dist_to_go_factor * lib.utils.chebyshevDistance( position, target ) )
+            self.prio_queue.push( position, 0 )
+
+        # Decide what to do.
+        if self.shortest_path_found:
+            # Target has been found.
+            if not self.path_optimized or position != self.expected_position:
+                # Compile the minimal-tick route from here to target over everything we know about the maze.
+                tracer.info("COMPILING ROUTE")
+                tracer.switch("route")
+                self.commands = compile_route( cells, position, rotation, (target['x'], target['y']),
+                                               corridors=self.corridors )
+                tracer.switch("search")
+                self.path_optimized = True
+                tracer.info("COMPILING ROUTE DONE, ticks: %s", None if self.commands is None else len(self.commands))
+
+            # Travel the route to target cell.
+            action = self.traverse_route(position, rotation)
+        else:
+            # Search for the target.
+            if self.use_frontier:
+                action = self.frontier(position, target, rotation, square)
+            elif self.use_DFS:
+                action = self.dfs(position, target, rotation, square)
+            else:
+                action = self.a_star(position, target, rotation, square)
+        tracer.debug("action: %s", action)
+        tracer.gauge("cells", len(cells))
+        tracer.gauge("stack", len(self.stack))
+        tracer.gauge("open_set", len(self.prio_queue))
+        tracer.switch(outer_phase)
+        tracer.end_tick(action=None if action is None else action["action"], pos=position)
+        return action
+
+    # Fills the store with the cached maze, explored breadth-first from position so parents and costs form a
+    # shortest-path tree. Returns False, leaving the store empty, if the cache doesn't know a way to the target.
+    def load_knowledge(self, position, target):
+        known = self.knowledge.known()
+        goal = (target['x'], target['y'])
+        parents = {position: None}
+        order = [position]
+        for cell in order:
+            if cell not in known:
+                continue
+            for neighbour in lib.utils.getNeighbours(cell, known[cell]):
+                if neighbour not in parents:
+                    parents[neighbour] = cell
+                    order.append(neighbour)
+        if goal not in parents:
+            return False
+
+        cells = self.cells
+        for cell in order:
+            parent = parents[cell]
+            cells.add( cell, parent, 0 if parent is None else cells.cost(parent) + 1,
+                       self.dist_to_go_factor * lib.utils.chebyshevDistance( cell, target ) )
+        for cell in order:
+            if cell not in known:
+                continue
+            for neighbour, rotation in lib.utils.getNeighbours(cell, known[cell]).items():
+                cells.link( cell, neighbour, rotation )
+                cells.link( neighbour, cell, lib.utils.get_opposite_angle(rotation) )
+            cells.set_visited(cell)
+        if self.corridors is not None:
+            self.corridors.clear()
+        self.shortest_path_found = True
+        self.path_optimized = False
+        self.knowledge_loaded = True
+        return True
+
+    # Drops everything known about the maze, e.g. when the cached maze turned out to be wrong.
+    def forget(self):
+        # A tiles store may hold a spill file.
+        if hasattr(self.cells, "close"):
+            self.cells.close()
+        self.cells = self.store()
+        self.cells.journal = self.journal
+        self.corridors = CorridorGraph(self.cells) if self.use_corridors else None
+        self.planner = RoutePlanner(self.cells, corridors=self.corridors)
+        self.stack = list()
+        self.prio_queue = IndexedHeap()
+        self.prio_queue.journal = self.journal
+        self.commands = deque()
+        self.shortest_path_found = False
+        self.path_optimized = False
+        self.expected_position = None
+        self.frontier_goal = None
+        self.dead = set()
+        self.knowledge_loaded = False
+
+    # Starts recording the inverse of every change to the search state, so a speculative tick can be undone.
+    def checkpoint(self):
+        self.journal = list()
+        self.cells.journal = self.journal
+        self.prio_queue.journal = self.journal
+        self.saved_state = (self.shortest_path_found, self.path_optimized, self.expected_position, self.commands,
+                            self.frontier_goal, self.cells.version, dict(self.planner.__dict__))
+
+    # Keeps the changes made since checkpoint().
+    def commit(self):
+        self.journal = None
+        self.cells.journal = None
+        self.prio_queue.journal = None
+        self.saved_state = None
+
+    # Undoes the changes made since checkpoint().
+    def rollback(self):
+        journal = self.journal
+        saved_state = self.saved_state
+        self.commit()
+        for inverse in reversed(journal):
+            inverse[0](*inverse[1:])
+        self.shortest_path_found, self.path_optimized, self.expected_position, self.commands, \
+            self.frontier_goal, self.cells.version, planner_state = saved_state
+        self.planner.__dict__.update(planner_state)
+        # Walks may have been cached over links that are gone now.
+        if self.corridors is not None:
+            self.corridors.clear()
+
+    def pop_stack(self):
+        cell = self.stack.pop()
+        if self.journal is not None:
+            self.journal.append((self.stack.append, cell))
+        return cell
+
+    def push_stack(self, cell):
+        self.stack.append(cell)
+        if self.journal is not None:
+            self.journal.append((self.stack.pop,))
+
+    # Implements the A* algorithm.
+    def a_star(self, position, target, rotation, square):
+        cells = self.cells
+        prio_queue = self.prio_queue
+        current_cell = position
+
+        # We need to check if we are on the right cell to continue with algorithm.
+        if current_cell == prio_queue.peek()[1]:
+            # We are on the cell with the most potential, so we can proceed with the algorithm.
+            prio_queue.pop()
+
+            # Try to straighten the corner leading to this cell, if there is one. Hopefully this will ease traveling back and forth.
+            if cells.parent(current_cell) is not None:
+                parent = cells.parent(current_cell)
+                if cells.parent(parent) is not None:
+                    grandparent = cells.parent(parent)
+                    self.tracer.debug("optimizing corner: %s %s %s", current_cell, parent, grandparent)
+                    lib.utils.optimize_corner(current_cell, grandparent, cells)
+                    if self.corridors is not None:
+                        self.corridors.touch(current_cell)
+                        self.corridors.touch(grandparent)
+
+
+            # Initialize the neighbours if this is the first time visiting this cell.
+            if not cells.visited(position):
+                neighbours = lib.utils.getNeighbours(position, square)
+                self.create_neighbour_cells( neighbours, position, target )
+                cells.set_visited(position)
+                self.prune_enclosed(position, target)
+
+            # Update estimates for neighbours.
+            for neighbour_position, neighbour_rotation in cells.neighbours(current_cell).items():
+                # Target found, stop algorithm.
+                if neighbour_position == (target['x'], target['y']):
+                    self.tracer.info("SHORTEST PATH FOUND")
+                    cells.add( neighbour_position, position, cells.cost(position) + 1 )
+                    return self.target_found(position, rotation, target)
+
+                # Check cost from current cell to neighbour, a shorter path is passed on to everything behind it.
+                self.propagate( neighbour_position, current_cell )
+
+        # We need to move to the next cell in prio queue to proceed with algorithm.
+        next_cell = prio_queue.peek()[1]
+
+        # Before searching for common ancestor between current cell and next cell check for next cell in current cell's neighbours.
+        # This might save time as next cell is somewhat likely to be a neighbour.
+        neighbour_rotation = cells.neighbour_rotation(current_cell, next_cell)
+        if neighbour_rotation is not None and rotation == neighbour_rotation:
+            return { "action": "move" }
+        # Next cell was found in neighbours but the rotation is incorrect -> rotate.
+        if neighbour_rotation is not None:
+            return { "action": "rotate", "rotation": neighbour_rotation }
+
+        return self.navigate(current_cell, rotation, next_cell)
+
+    # Resets so the compiled route is run from the start. If the start isn't known, because the store was
+    # forgotten partway through the game, there is no route from it: the route is compiled from here instead.
+    def target_found(self, position, rotation, target):
+        self.shortest_path_found = True
+        if self.start is None or self.start in self.cells:
+            return { "action": "reset" }
+        self.tracer.info("START UNKNOWN, COMPILING ROUTE FROM HERE")
+        self.commands = compile_route( self.cells, position, rotation, (target['x'], target['y']),
+                                       corridors=self.corridors )
+        self.path_optimized = True
+        return self.traverse_route(position, rotation)
+
+    # Sends the next precompiled command and remembers where it should take us.
+    def traverse_route(self, position, rotation):
+        if not self.commands:
+            self.tracer.info("traverse_route(): No route to target")
+            return None
+        action = self.commands.popleft()
+        if self.journal is not None:
+            self.journal.append((self.commands.appendleft, action))
+        if action["action"] == "move":
+            self.expected_position = lib.utils.calculate_next_position(position, rotation)
+        else:
+            self.expected_position = position
+        return action
+
+    # Create basic cell data for the neighbours of the current cell.
+    def create_neighbour_cells(self, neighbours, position, target={'x': 999999, 'y': 999999}):
+        cells = self.cells
+        if self.corridors is not None:
+            self.corridors.touch(position)
+        for pos, rotation in neighbours.items():
+            cells.link( position, pos, rotation )
+            if self.corridors is not None:
+                self.corridors.touch(pos)
+            if not pos in cells:
+                # First time we see this cell. Initialize.
+                estimate_to_target = self.dist_to_go_factor * lib.utils.chebyshevDistance( pos, target )
+                cells.add( pos, position, cells.cost(position) + 1, estimate_to_target )
+                if self.use_frontier:
+                    self.prio_queue.push( pos, estimate_to_target )
+                elif not self.use_DFS:
+                    self.prio_queue.push( pos, self.dist_traveled_factor*cells.cost(pos) + estimate_to_target )
+
+            cells.link( pos, position, lib.utils.get_opposite_angle(rotation) )
+
+            # A link to a cell we knew already closes a loop, which may give either end a shorter way to the start.
+            self.propagate( pos, position )
+            self.propagate( position, pos )
+
+    # Keeps costs and parents a shortest-path tree from the start as links are discovered. Links are only ever
+    # added, so costs only go down: a lower cost is pushed out from cell over the links, Dijkstra style, and stops
+    # wherever it doesn't improve anything (the decrease-only case of LPA*). Only the changed region is touched.
+    # Open A* cells get their priority lowered.
+    def propagate(self, cell, via):
+        cells = self.cells
+        cost = cells.cost(via) + 1
+        if cost >= cells.cost(cell):
+            return
+        cells.set_cost(cell, cost)
+        cells.set_parent(cell, via)
+        use_a_star = not self.use_DFS and not self.use_frontier
+        changed = [(cost, cell)]
+        while changed:
+            cost, current = heapq.heappop(changed)
+            if cost > cells.cost(current):
+                continue
+            self.tracer.count("propagated")
+            if use_a_star and current in self.prio_queue:
+                self.prio_queue.push( current, self.dist_traveled_factor * cost + cells.estimate(current) )
+            for neighbour in cells.neighbours(current):
+                if cost + 1 < cells.cost(neighbour):
+                    cells.set_cost(neighbour, cost + 1)
+                    cells.set_parent(neighbour, current)
+                    heapq.heappush(changed, (cost + 1, neighbour))
+
+
+    # Next command towards a cell that is not a neighbour of position.
+    def navigate(self, position, rotation, next_cell):
+        cells = self.cells
+        tracer = self.tracer
+        outer_phase = tracer.switch("navigation")
+
+        # Take the cheapest known route to the next cell.
+        if self.use_route_planner:
+            action = self.planner.next_command(position, rotation, next_cell)
+            if action is not None:
+                tracer.switch(outer_phase)
+                return action
+
+        # Find common ancestor in order to eventually find the next cell.
+        tracer.count("lca")
+        common_ancestor = self.findCommonAncestor( position, next_cell )
+
+        # Need to go backwards to get to common ancestor.
+        if common_ancestor != position:
+            target_rotation = cells.neighbour_rotation(position, cells.parent(position))
+        # Current cell is the common ancestor, so we can traverse the path to the next cell.
+        else:
+            # Find neighbouring cell that will take us towards the next cell.
+            target_rotation = cells.neighbour_rotation(position, cells.ancestry.next_step(position, next_cell))
+        tracer.switch(outer_phase)
+        if rotation == target_rotation:
+            return { "action": "move" }
+        return { "action": "rotate", "rotation": target_rotation }
+
+    # Search, navigation and open-set numbers of this game so far.
+    def summary(self):
+        summary = self.tracer.summary()
+        summary["planner"] = {"replans": self.planner.replans, "reuses": self.planner.reuses}
+        if self.corridors is not None:
+            summary["corridors"] = {"walks": len(self.corridors.walks), "hits": self.corridors.hits,
+                                    "misses": self.corridors.misses}
+        summary["open_set"] = self.prio_queue.stats()
+        if hasattr(self.cells, "stats"):
+            summary["store"] = self.cells.stats()
+        return summary
+
+    # Drops the frontier cells of unexplored regions that visiting position cut off from the target.
+    def prune_enclosed(self, position, target):
+        if not self.use_pruning or self.maze_size is None:
+            return
+        cells = self.cells
+        journal = self.journal
+        for region in enclosed_regions(cells, self.dead, self.maze_size, position, (target['x'], target['y'])):
+            frontier = [cell for cell in region if cell in cells]
+            # A* is after the shortest path, so it only drops pockets with a single way in. A region with more
+            # might still hold a shortcut between explored cells.
+            if not self.use_DFS and not self.use_frontier and sum(len(cells.neighbours(cell)) for cell in frontier) > 1:
+                continue
+            for cell in region:
+                self.dead.add(cell)
+                if journal is not None:
+                    journal.append((self.dead.discard, cell))
+            for cell in frontier:
+                if cell in self.prio_queue:
+                    self.prio_queue.remove(cell)
+            if self.use_DFS and frontier:
+                pruned = set(frontier)
+                if journal is not None:
+                    journal.append((setattr, self, "stack", self.stack))
+                self.stack = [cell for cell in self.stack if cell not in pruned]
+            self.tracer.count("pruned_regions")
+            self.tracer.count("pruned_frontier", len(frontier))
+            self.tracer.count("pruned_cells", len(region))
+
+    # Frontier cell with the lowest travel cost from position plus estimate to target, or None if there is none.
+    # Travel cost is counted in moves over known links (diagonals included). The Dijkstra search stops as soon as
+    # no cell left can beat the best one found. A cell reached with cost c' >= c scores at least c' plus the lowest
+    # estimate in the frontier, and since a move changes the distance to target by at most one, also at least
+    # c' + factor * (distance_here - c'). That second bound only grows with c' if factor <= 1, so for larger
+    # factors it is taken with factor 1. So usually only the part of the maze around us is searched.
+    # Travel costs are from the current position, which moves every tick, so they are searched again for each
+    # choice instead of being kept up to date. A goal is only chosen once the last one is reached, and the bounded
+    # search stays local, which costs less than keeping a shortest-path tree from a moving start.
+    def choose_frontier(self, position, target):
+        cells = self.cells
+        frontier = self.prio_queue
+        if len(frontier) == 0:
+            return None
+        lowest_estimate = frontier.peek()[0]
+        distance_here = lib.utils.chebyshevDistance(position, target)
+        factor = min(1, self.dist_to_go_factor)
+        best = None
+        best_score = float("inf")
+        costs = {position: 0}
+        open_set = [(0, position)]
+        while open_set:
+            cost, cell = heapq.heappop(open_set)
+            if cost > costs[cell]:
+                continue
+            if cost + max(lowest_estimate, factor * max(0, distance_here - cost)) >= best_score:
+                break
+            self.tracer.count("frontier_cells_searched")
+            if cell in frontier:
+                score = cost + cells.estimate(cell)
+                if score < best_score:
+                    best = cell
+                    best_score = score
+                # Only the link we found it by is known, nothing to search beyond it.
+                continue
+            for neighbour in known_moves(cells, cell):
+                if neighbour in cells and cost + 1 < costs.get(neighbour, cost + 2):
+                    costs[neighbour] = cost + 1
+                    heapq.heappush(open_set, (cost + 1, neighbour))
+        return best
+
+    # Explores by always heading for the frontier cell that is cheapest to reach and closest to target.
+    def frontier(self, position, target, rotation, square):
+        cells = self.cells
+        if not cells.visited(position):
+            neighbours = lib.utils.getNeighbours(position, square)
+            self.create_neighbour_cells( neighbours, position, target )
+            cells.set_visited(position)
+            if position in self.prio_queue:
+                self.prio_queue.remove(position)
+            self.prune_enclosed(position, target)
+            if (target['x'], target['y']) in neighbours:
+                self.tracer.info("TARGET FOUND")
+                return self.target_found(position, rotation, target)
+
+        # Pick a new frontier cell only once we have reached the last one, the route to it is cached meanwhile.
+        if self.frontier_goal is None or self.frontier_goal not in self.prio_queue:
+            self.frontier_goal = self.choose_frontier(position, target)
+            self.tracer.count("frontier_choices")
+            if self.frontier_goal is None:
+                self.tracer.info("frontier(): Nothing left to explore")
+                return None
+
+        neighbour_rotation = cells.neighbour_rotation(position, self.frontier_goal)
+        if neighbour_rotation is not None and rotation == neighbour_rotation:
+            return { "action": "move" }
+        if neighbour_rotation is not None:
+            return { "action": "rotate", "rotation": neighbour_rotation }
+        return self.navigate(position, rotation, self.frontier_goal)
+
+    # Finds common ancestor of two cells in O(log n) with the store's ancestor index.
+    def findCommonAncestor(self, a, b):
+        return self.cells.ancestry.lca(a, b)
+
+    def dfs(self, position, target, rotation, square):
+        cells = self.cells
+        # Get neighbours for a cell if this is the first time visiting it.
+        if not cells.visited(position):
+            neighbours = lib.utils.getNeighbours(position, square)
+            self.create_neighbour_cells( neighbours, position )
+
+            # Add neighbours to stack in order of distance to target.
+            # This heuristic was implemented because of the increasing maze size. Not sure if actually helpful.
+            if self.use_heuristics_in_dfs:
+                neighbours_by_dist = list()
+                for neighbour in neighbours.keys():
+                    neighbours_by_dist.append( ( self.dist_to_go_factor * lib.utils.calculateDistance( neighbour, target ), neighbour) )
+                sort_by_dist = lambda x: x[0]
+                neighbours_by_dist.sort(reverse=True, key=sort_by_dist)
+                for i in neighbours_by_dist:
+                    self.push_stack( i[1] )
+            else:
+                # Just add neighbours to stack in 'random' order.
+                for neighbour in neighbours.keys():
+                    self.push_stack( neighbour )
+            cells.set_visited(position)
+            self.prune_enclosed(position, target)
+
+        # Choose next_cell but skip visited cells.
+        next_cell = self.pop_stack()
+        while cells.visited(next_cell) or next_cell == position:  # second condition is needed. Source: trust me.
+            next_cell = self.pop_stack()
+        self.tracer.debug("next_cell: %s", next_cell)
+
+        # Search current cell's neighbours for the next cell.
+        for neighbour_position, neighbour_rotation in cells.neighbours(position).items():
+            # print("neighbour: ", neighbour_position, neighbour_rotation)
+            # Target found, great! Reset to traverse the shortest path.
+            if neighbour_position == (target['x'], target['y']):
+                cells.add( neighbour_position, position, cells.cost(position) + 1 )
+                self.tracer.info("TARGET FOUND")
+                return self.target_found(position, rotation, target)
+
+            # Next cell was found in neighbours and the rotation is correct -> move.
+            if neighbour_position == next_cell and rotation == neighbour_rotation:
+                return { "action": "move" }
+
+            # Next cell was found in neighbours but the rotation is incorrect -> rotate.
+            if neighbour_position == next_cell:
+                self.push_stack( next_cell )  # Add the cell back to the stack.
+                return { "action": "rotate", "rotation": neighbour_rotation }
+
+        # Next cell was not found in neighbours -> we might need to go backwards.
+        # Add the cell back to the stack for now.
+        self.push_stack( next_cell )
+
+        return self.navigate(position, rotation, next_cell)
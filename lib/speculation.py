@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.maze import NORTH, EAST, SOUTH, WEST
+from lib.trace import Tracer, OFF
+from lib.utils import calculate_next_position
+
+# Returned by a speculative run that raised, so the tick is computed again for real.
+FAILED = object()
+
+
+# The parts of game_state that generate_commands depends on.
+def decision_inputs(game_state):
+    player = game_state['player']
+    return (player['position']['x'], player['position']['y'], player['rotation'], game_state['square'],
+            game_state['target']['x'], game_state['target']['y'], game_state['start']['x'], game_state['start']['y'])
+
+
+# Square value of a visited cell, rebuilt from its orthogonal links.
+def known_square(cells, position):
+    square = 0
+    for rotation, wall in ((0, NORTH), (90, EAST), (180, SOUTH), (270, WEST)):
+        if cells.neighbour_rotation(position, calculate_next_position(position, rotation)) != rotation:
+            square |= wall
+    return square
+
+
+# Game state we expect after commands, or None if it can't be known in advance
+# (e.g. a move into a cell whose walls we haven't seen yet).
+def predict_next_state(game_state, commands, cells):
+    if commands is None:
+        return None
+    position = (game_state['player']['position']['x'], game_state['player']['position']['y'])
+    rotation = game_state['player']['rotation']
+    square = game_state['square']
+    action = commands.get("action")
+    if action == "rotate":
+        rotation = commands["rotation"]
+    elif action == "move" or action == "reset":
+        if action == "move":
+            position = calculate_next_position(position, rotation)
+        else:
+            position = (game_state['start']['x'], game_state['start']['y'])
+            rotation = 0
+        if position not in cells or not cells.visited(position):
+            return None
+        square = known_square(cells, position)
+    else:
+        return None
+    if position == (game_state['target']['x'], game_state['target']['y']):
+        return None
+
+    predicted = dict(game_state)
+    predicted['player'] = {"position": {"x": position[0], "y": position[1]}, "rotation": rotation}
+    predicted['square'] = square
+    return predicted
+
+
+# Computes the next decision on a worker thread while the command is on its way to the server.
+# The speculative tick runs on the real solver under a checkpoint; if the game state that arrives matches the
+# prediction the result is used as is, otherwise the tick is rolled back and computed again.
+# Meant for one game per process (main.py, benchmark.py): generate_commands waits for the worker, so it must not
+# be called from an event loop that drives other games too.
+class Speculator:
+    def __init__(self, solver, executor=None):
+        self.solver = solver
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=1)
+        self.pending = None
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        # Speculative ticks are traced here, so they don't show up as ticks of the game or race the caller's timers.
+        self.scratch_tracer = Tracer(OFF)
+
+    def run(self, predicted):
+        self.solver.checkpoint()
+        tracer = self.solver.tracer
+        self.solver.tracer = self.scratch_tracer
+        try:
+            return self.solver.generate_commands(predicted)
+        except Exception:
+            return FAILED
+        finally:
+            self.solver.tracer = tracer
+
+    # Call after sending commands computed from game_state.
+    def speculate(self, game_state, commands):
+        predicted = predict_next_state(game_state, commands, self.solver.cells)
+        if predicted is None:
+            self.skipped += 1
+            return
+        self.pending = (decision_inputs(predicted), self.executor.submit(self.run, predicted))
+
+    def generate_commands(self, game_state):
+        if self.pending is None:
+            return self.solver.generate_commands(game_state)
+
+        inputs, future = self.pending
+        self.pending = None
+        result = future.result()
+        if result is not FAILED and inputs == decision_inputs(game_state):
+            self.solver.commit()
+            self.hits += 1
+            self.solver.tracer.end_tick(action=None if result is None else result["action"], speculated=True)
+            return result
+        self.solver.rollback()
+        self.misses += 1
+        return self.solver.generate_commands(game_state)
+
+    # Drops a pending speculation, e.g. when the last command was rejected and is sent again.
+    def cancel(self):
+        if self.pending is None:
+            return
+        self.pending[1].result()
+        self.pending = None
+        self.solver.rollback()
+        self.misses += 1
+
+    def hit_rate(self):
+        attempts = self.hits + self.misses
+        return self.hits / attempts if attempts else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "skipped": self.skipped, "hit_rate": self.hit_rate()}
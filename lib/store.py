@@ -0,0 +1,296 @@
+from array import array
+
+from lib.ancestry import AncestorIndex
+from lib.cell import Cell
+
+# Direction codes are rotation // 45, so the 8 link bits of a cell map directly to rotations.
+DIRECTIONS = ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))
+NO_PARENT = 8
+KNOWN = 1
+VISITED = 2
+
+# Direction codes for each 8-bit link mask, so neighbours() doesn't have to test every bit.
+MASK_CODES = tuple(tuple(code for code in range(8) if mask & (1 << code)) for mask in range(256))
+
+
+def direction_code(position, other):
+    return DIRECTIONS.index((other[0] - position[0], other[1] - position[1]))
+
+
+# Both stores keep an AncestorIndex of the parent tree up to date in add() and set_parent(),
+# and count new links in version so route plans know when they may be outdated.
+# While journal is a list, every change appends its inverse as (function, *args) so it can be rolled back.
+
+# Maze knowledge in the original representation: a dict of Cell objects plus tuple keyed cost and estimate dicts.
+# Kept for comparison with GridStore.
+class DictStore:
+    def __init__(self):
+        self.cells = dict()
+        self.costs = dict()
+        self.estimates = dict()
+        self.ancestry = AncestorIndex()
+        self.version = 0
+        self.journal = None
+
+    def __contains__(self, position):
+        return position in self.cells
+
+    def __len__(self):
+        return len(self.cells)
+
+    def add(self, position, parent, cost, estimate=0):
+        if self.journal is not None:
+            if position in self.cells:
+                self.journal.append((self.restore, position, self.snapshot(position)))
+            else:
+                self.journal.append((self.remove, position))
+        cell = Cell(position[0], position[1], estimate)
+        cell.set_previous_cell(parent)
+        self.cells[position] = cell
+        self.costs[position] = cost
+        self.estimates[position] = estimate
+        self.ancestry.add(position, parent)
+        self.version += 1
+
+    def snapshot(self, position):
+        return (self.cells[position], self.costs[position], self.estimates[position])
+
+    def restore(self, position, snapshot):
+        cell, self.costs[position], self.estimates[position] = snapshot
+        self.cells[position] = cell
+        self.ancestry.reparent(position, cell.previous_cell)
+
+    def remove(self, position):
+        del self.cells[position]
+        del self.costs[position]
+        del self.estimates[position]
+        self.ancestry.remove(position)
+
+    def neighbours(self, position):
+        return self.cells[position].neighbours
+
+    def neighbour_rotation(self, position, other):
+        return self.cells[position].neighbours.get(other)
+
+    def link(self, position, other, rotation):
+        neighbours = self.cells[position].neighbours
+        old_rotation = neighbours.get(other)
+        if old_rotation != rotation:
+            if self.journal is not None:
+                self.journal.append((self.unlink, position, other, old_rotation))
+            neighbours[other] = rotation
+            self.version += 1
+
+    # Removes a link, or puts back the previous rotation of it.
+    def unlink(self, position, other, rotation=None):
+        neighbours = self.cells[position].neighbours
+        if rotation is None:
+            neighbours.pop(other, None)
+        else:
+            neighbours[other] = rotation
+
+    def parent(self, position):
+        return self.cells[position].previous_cell
+
+    def set_parent(self, position, parent):
+        if self.journal is not None:
+            self.journal.append((self.set_parent, position, self.cells[position].previous_cell))
+        self.cells[position].set_previous_cell(parent)
+        self.ancestry.reparent(position, parent)
+
+    def visited(self, position):
+        return self.cells[position].visited
+
+    def set_visited(self, position):
+        if self.journal is not None and not self.cells[position].visited:
+            self.journal.append((self.clear_visited, position))
+        self.cells[position].set_visited()
+
+    def clear_visited(self, position):
+        self.cells[position].visited = False
+
+    def cost(self, position):
+        return self.costs[position]
+
+    def set_cost(self, position, cost):
+        if self.journal is not None:
+            self.journal.append((self.set_cost, position, self.costs[position]))
+        self.costs[position] = cost
+
+    def estimate(self, position):
+        return self.estimates[position]
+
+
+# Maze knowledge in flat arrays covering the explored bounding box. Per cell: link bits (one per 45 degree
+# direction), known/visited flags, direction code of the parent, cost and estimate. The box grows as needed.
+# Like DictStore, everything but add() raises KeyError for positions that are not in the store.
+class GridStore:
+    def __init__(self, origin=(0, 0), size=(16, 16)):
+        self.x0, self.y0 = origin
+        self.width, self.height = size
+        n = self.width * self.height
+        self.links = bytearray(n)
+        self.flags = bytearray(n)
+        self.parents = bytearray([NO_PARENT]) * n
+        self.costs = array('i', bytes(4 * n))
+        self.estimates = array('d', bytes(8 * n))
+        self.count = 0
+        self.ancestry = AncestorIndex()
+        self.version = 0
+        self.journal = None
+
+    def index(self, position):
+        x = position[0] - self.x0
+        y = position[1] - self.y0
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return -1
+
+    # Index of a position that is in the store, KeyError otherwise.
+    def known_index(self, position):
+        x = position[0] - self.x0
+        y = position[1] - self.y0
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = y * self.width + x
+            if self.flags[i] & KNOWN:
+                return i
+        raise KeyError(position)
+
+    # Reallocates the arrays so that position fits in, at least doubling the box in the growing direction.
+    def grow(self, position):
+        x0 = min(self.x0, position[0] - self.width) if position[0] < self.x0 else self.x0
+        y0 = min(self.y0, position[1] - self.height) if position[1] < self.y0 else self.y0
+        x1 = self.x0 + self.width
+        y1 = self.y0 + self.height
+        x1 = max(x1, position[0] + 1 + self.width) if position[0] >= x1 else x1
+        y1 = max(y1, position[1] + 1 + self.height) if position[1] >= y1 else y1
+        width = x1 - x0
+        height = y1 - y0
+        n = width * height
+
+        links = bytearray(n)
+        flags = bytearray(n)
+        parents = bytearray([NO_PARENT]) * n
+        costs = array('i', bytes(4 * n))
+        estimates = array('d', bytes(8 * n))
+        for row in range(self.height):
+            old = row * self.width
+            new = (row + self.y0 - y0) * width + (self.x0 - x0)
+            links[new:new + self.width] = self.links[old:old + self.width]
+            flags[new:new + self.width] = self.flags[old:old + self.width]
+            parents[new:new + self.width] = self.parents[old:old + self.width]
+            costs[new:new + self.width] = self.costs[old:old + self.width]
+            estimates[new:new + self.width] = self.estimates[old:old + self.width]
+
+        self.x0, self.y0, self.width, self.height = x0, y0, width, height
+        self.links, self.flags, self.parents, self.costs, self.estimates = links, flags, parents, costs, estimates
+
+    def __contains__(self, position):
+        i = self.index(position)
+        return i >= 0 and self.flags[i] & KNOWN != 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, position, parent, cost, estimate=0):
+        i = self.index(position)
+        if i < 0:
+            self.grow(position)
+            i = self.index(position)
+        if self.journal is not None:
+            if self.flags[i] & KNOWN:
+                self.journal.append((self.restore, position, self.snapshot(position)))
+            else:
+                self.journal.append((self.remove, position))
+        if not self.flags[i] & KNOWN:
+            self.count += 1
+        self.flags[i] = KNOWN
+        self.links[i] = 0
+        self.parents[i] = NO_PARENT if parent is None else direction_code(position, parent)
+        self.costs[i] = cost
+        self.estimates[i] = estimate
+        self.ancestry.add(position, parent)
+        self.version += 1
+
+    def snapshot(self, position):
+        i = self.index(position)
+        return (self.flags[i], self.links[i], self.parent(position), self.costs[i], self.estimates[i])
+
+    def restore(self, position, snapshot):
+        i = self.index(position)
+        self.flags[i], self.links[i], parent, self.costs[i], self.estimates[i] = snapshot
+        self.parents[i] = NO_PARENT if parent is None else direction_code(position, parent)
+        self.ancestry.reparent(position, parent)
+
+    def remove(self, position):
+        i = self.index(position)
+        self.flags[i] = 0
+        self.links[i] = 0
+        self.parents[i] = NO_PARENT
+        self.count -= 1
+        self.ancestry.remove(position)
+
+    def neighbours(self, position):
+        x, y = position
+        return {(x + DIRECTIONS[code][0], y + DIRECTIONS[code][1]): code * 45
+                for code in MASK_CODES[self.links[self.known_index(position)]]}
+
+    def neighbour_rotation(self, position, other):
+        dx = other[0] - position[0]
+        dy = other[1] - position[1]
+        if dx < -1 or dx > 1 or dy < -1 or dy > 1 or (dx == 0 and dy == 0):
+            return None
+        code = DIRECTIONS.index((dx, dy))
+        if self.links[self.known_index(position)] & (1 << code):
+            return code * 45
+        return None
+
+    def link(self, position, other, rotation):
+        i = self.known_index(position)
+        bit = 1 << (rotation // 45)
+        if not self.links[i] & bit:
+            if self.journal is not None:
+                self.journal.append((self.unlink, position, other, rotation))
+            self.links[i] |= bit
+            self.version += 1
+
+    def unlink(self, position, other, rotation):
+        self.links[self.index(position)] &= ~(1 << (rotation // 45))
+
+    def parent(self, position):
+        x, y = position
+        code = self.parents[self.known_index(position)]
+        if code == NO_PARENT:
+            return None
+        dx, dy = DIRECTIONS[code]
+        return (x + dx, y + dy)
+
+    def set_parent(self, position, parent):
+        if self.journal is not None:
+            self.journal.append((self.set_parent, position, self.parent(position)))
+        self.parents[self.known_index(position)] = NO_PARENT if parent is None else direction_code(position, parent)
+        self.ancestry.reparent(position, parent)
+
+    def visited(self, position):
+        return self.flags[self.known_index(position)] & VISITED != 0
+
+    def set_visited(self, position):
+        i = self.known_index(position)
+        if self.journal is not None and not self.flags[i] & VISITED:
+            self.journal.append((self.clear_visited, position))
+        self.flags[i] |= VISITED
+
+    def clear_visited(self, position):
+        self.flags[self.index(position)] &= ~VISITED
+
+    def cost(self, position):
+        return self.costs[self.known_index(position)]
+
+    def set_cost(self, position, cost):
+        i = self.known_index(position)
+        if self.journal is not None:
+            self.journal.append((self.set_cost, position, self.costs[i]))
+        self.costs[i] = cost
+
+    def estimate(self, position):
+        return self.estimates[self.known_index(position)]
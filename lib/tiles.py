@@ -0,0 +1,424 @@
+import mmap
+import struct
+import tempfile
+import zlib
+from array import array
+
+from lib.store import DIRECTIONS, NO_PARENT, KNOWN, VISITED, MASK_CODES, direction_code
+
+TILE_BITS = 6
+TILE = 1 << TILE_BITS
+TILE_MASK = TILE - 1
+CELLS = TILE * TILE
+# Bytes of one hot tile: links, flags and parent code, cost, estimate, depth and jump pointer x and y.
+TILE_BYTES = CELLS * (1 + 1 + 1 + 4 + 8 + 4 + 4 + 4)
+COUNTS = struct.Struct("<ii")
+# Index offset in a tile and the parent code pointing back, of each direction code's neighbour.
+CHILD_OFFSETS = tuple((dy * TILE + dx, (code + 4) % 8) for code, (dx, dy) in enumerate(DIRECTIONS))
+
+
+# Per cell fields of one tile in flat arrays, indexed (y % TILE) * TILE + x % TILE. Same fields as GridStore
+# plus depth and jump pointer of the ancestor index, which lives in the tiles too so it is bounded as well.
+class Tile:
+    __slots__ = ("links", "flags", "parents", "costs", "estimates", "depths", "jumps", "known", "unvisited", "used")
+
+    def __init__(self):
+        self.links = bytearray(CELLS)
+        self.flags = bytearray(CELLS)
+        self.parents = bytearray([NO_PARENT]) * CELLS
+        self.costs = array('i', bytes(4 * CELLS))
+        self.estimates = array('d', bytes(8 * CELLS))
+        self.depths = array('i', bytes(4 * CELLS))
+        self.jumps = array('i', bytes(8 * CELLS))
+        # Known cells, and known cells that are not visited yet. A tile without unvisited cells is fully explored.
+        self.known = 0
+        self.unvisited = 0
+        self.used = 0
+
+    # Packed cold form: all arrays compressed with zlib. Explored tiles are mostly empty space and short links,
+    # so they pack to a few KiB.
+    def pack(self):
+        return zlib.compress(COUNTS.pack(self.known, self.unvisited) + bytes(self.links) + bytes(self.flags) +
+                             bytes(self.parents) + self.costs.tobytes() + self.estimates.tobytes() +
+                             self.depths.tobytes() + self.jumps.tobytes(), 1)
+
+    @staticmethod
+    def unpack(blob):
+        data = memoryview(zlib.decompress(blob))
+        tile = Tile()
+        tile.known, tile.unvisited = COUNTS.unpack_from(data)
+        offset = COUNTS.size
+        for name, size in (("links", 1), ("flags", 1), ("parents", 1)):
+            getattr(tile, name)[:] = data[offset:offset + size * CELLS]
+            offset += size * CELLS
+        for name, size in (("costs", 4), ("estimates", 8), ("depths", 4), ("jumps", 8)):
+            field = array(getattr(tile, name).typecode)
+            field.frombytes(data[offset:offset + size * CELLS])
+            setattr(tile, name, field)
+            offset += size * CELLS
+        return tile
+
+
+# Cold tiles kept in a memory-mapped temporary file instead of memory. A tile that is packed again goes back
+# into its old slot if it still fits, otherwise to the end of the file.
+class SpillFile:
+    def __init__(self, directory=None):
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.size = 1 << 20
+        self.file.truncate(self.size)
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.end = 0
+        # key -> (offset, slot length, blob length)
+        self.slots = dict()
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def write(self, key, blob):
+        slot = self.slots.get(key)
+        if slot is not None and len(blob) <= slot[1]:
+            offset, length = slot[0], slot[1]
+        else:
+            offset, length = self.end, len(blob)
+            self.end += length
+            if self.end > self.size:
+                while self.end > self.size:
+                    self.size *= 2
+                self.map.close()
+                self.file.truncate(self.size)
+                self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.map[offset:offset + len(blob)] = blob
+        self.slots[key] = (offset, length, len(blob))
+
+    def read(self, key):
+        offset, _, length = self.slots[key]
+        return self.map[offset:offset + length]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+# Maze knowledge split into 64x64 tiles that are only allocated where cells are known, for very large mazes.
+# At most max_bytes of tiles are kept as arrays (hot). Past that the least recently used tiles, fully explored
+# ones first, are packed (cold) into memory or, with spill set to a directory, into a memory-mapped file there.
+# A cold tile is unpacked again the first time one of its cells is read. Any slot() call may pack other tiles,
+# so methods write to a tile only after their last slot() call for other cells.
+# Same interface as GridStore, with the ancestor index kept in the tiles (TileAncestry).
+class TileStore:
+    def __init__(self, max_bytes=64 << 20, spill=None):
+        self.hot = dict()
+        self.cold = dict()
+        self.spill = SpillFile(spill) if spill is not None else None
+        self.max_tiles = max(4, max_bytes // TILE_BYTES)
+        self.count = 0
+        self.clock = 0
+        self.ancestry = TileAncestry(self)
+        self.version = 0
+        self.journal = None
+        self.hits = 0
+        self.faults = 0
+        self.compactions = 0
+
+    # (tile, index in tile) of a position, creating or unpacking the tile when needed.
+    def slot(self, position):
+        x, y = position
+        key = (x >> TILE_BITS, y >> TILE_BITS)
+        tile = self.hot.get(key)
+        if tile is None:
+            tile = self.load(key)
+        else:
+            self.hits += 1
+        tile.used = self.clock
+        return tile, (y & TILE_MASK) << TILE_BITS | (x & TILE_MASK)
+
+    def load(self, key):
+        if len(self.hot) >= self.max_tiles:
+            self.compact()
+        if self.spill is not None and key in self.spill:
+            tile = Tile.unpack(self.spill.read(key))
+            self.faults += 1
+        elif key in self.cold:
+            tile = Tile.unpack(self.cold.pop(key))
+            self.faults += 1
+        else:
+            tile = Tile()
+        self.hot[key] = tile
+        return tile
+
+    # Packs tiles until 3/4 of max_tiles are hot, so packing happens in batches.
+    def compact(self):
+        order = sorted(self.hot, key=lambda key: (self.hot[key].unvisited > 0, self.hot[key].used))
+        for key in order[:len(self.hot) - self.max_tiles * 3 // 4]:
+            blob = self.hot.pop(key).pack()
+            if self.spill is not None:
+                self.spill.write(key, blob)
+            else:
+                self.cold[key] = blob
+            self.compactions += 1
+
+    def __contains__(self, position):
+        x, y = position
+        key = (x >> TILE_BITS, y >> TILE_BITS)
+        if key not in self.hot and key not in self.cold and (self.spill is None or key not in self.spill):
+            return False
+        tile, i = self.slot(position)
+        return tile.flags[i] & KNOWN != 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, position, parent, cost, estimate=0):
+        self.clock += 1
+        tile, i = self.slot(position)
+        if self.journal is not None:
+            if tile.flags[i] & KNOWN:
+                self.journal.append((self.restore, position, self.snapshot(position)))
+            else:
+                self.journal.append((self.remove, position))
+        if not tile.flags[i] & KNOWN:
+            self.count += 1
+            tile.known += 1
+            tile.unvisited += 1
+        elif tile.flags[i] & VISITED:
+            tile.unvisited += 1
+        tile.flags[i] = KNOWN
+        tile.links[i] = 0
+        tile.parents[i] = NO_PARENT if parent is None else direction_code(position, parent)
+        tile.costs[i] = cost
+        tile.estimates[i] = estimate
+        self.ancestry.add(position, parent)
+        self.version += 1
+
+    def snapshot(self, position):
+        tile, i = self.slot(position)
+        return (tile.flags[i], tile.links[i], self.parent(position), tile.costs[i], tile.estimates[i])
+
+    def restore(self, position, snapshot):
+        old_parent = self.parent(position)
+        tile, i = self.slot(position)
+        was_visited = tile.flags[i] & VISITED
+        tile.flags[i], tile.links[i], parent, tile.costs[i], tile.estimates[i] = snapshot
+        tile.unvisited += (was_visited != 0) - (tile.flags[i] & VISITED != 0)
+        if parent != old_parent:
+            tile.parents[i] = NO_PARENT if parent is None else direction_code(position, parent)
+            self.ancestry.reparent(position, parent)
+
+    def remove(self, position):
+        self.ancestry.remove(position)
+        tile, i = self.slot(position)
+        if not tile.flags[i] & VISITED:
+            tile.unvisited -= 1
+        tile.known -= 1
+        tile.flags[i] = 0
+        tile.links[i] = 0
+        tile.parents[i] = NO_PARENT
+        self.count -= 1
+
+    def neighbours(self, position):
+        tile, i = self.slot(position)
+        x, y = position
+        return {(x + DIRECTIONS[code][0], y + DIRECTIONS[code][1]): code * 45 for code in MASK_CODES[tile.links[i]]}
+
+    def neighbour_rotation(self, position, other):
+        dx = other[0] - position[0]
+        dy = other[1] - position[1]
+        if dx < -1 or dx > 1 or dy < -1 or dy > 1 or (dx == 0 and dy == 0):
+            return None
+        code = DIRECTIONS.index((dx, dy))
+        tile, i = self.slot(position)
+        if tile.links[i] & (1 << code):
+            return code * 45
+        return None
+
+    def link(self, position, other, rotation):
+        tile, i = self.slot(position)
+        bit = 1 << (rotation // 45)
+        if not tile.links[i] & bit:
+            if self.journal is not None:
+                self.journal.append((self.unlink, position, other, rotation))
+            tile.links[i] |= bit
+            self.version += 1
+
+    def unlink(self, position, other, rotation):
+        tile, i = self.slot(position)
+        tile.links[i] &= ~(1 << (rotation // 45))
+
+    def parent(self, position):
+        tile, i = self.slot(position)
+        code = tile.parents[i]
+        if code == NO_PARENT:
+            return None
+        dx, dy = DIRECTIONS[code]
+        return (position[0] + dx, position[1] + dy)
+
+    def set_parent(self, position, parent):
+        old_parent = self.parent(position)
+        if self.journal is not None:
+            self.journal.append((self.set_parent, position, old_parent))
+        if parent == old_parent:
+            return
+        tile, i = self.slot(position)
+        tile.parents[i] = NO_PARENT if parent is None else direction_code(position, parent)
+        self.ancestry.reparent(position, parent)
+
+    def visited(self, position):
+        tile, i = self.slot(position)
+        return tile.flags[i] & VISITED != 0
+
+    def set_visited(self, position):
+        self.clock += 1
+        tile, i = self.slot(position)
+        if not tile.flags[i] & VISITED:
+            if self.journal is not None:
+                self.journal.append((self.clear_visited, position))
+            tile.flags[i] |= VISITED
+            tile.unvisited -= 1
+
+    def clear_visited(self, position):
+        tile, i = self.slot(position)
+        if tile.flags[i] & VISITED:
+            tile.flags[i] &= ~VISITED
+            tile.unvisited += 1
+
+    def cost(self, position):
+        tile, i = self.slot(position)
+        return tile.costs[i]
+
+    def set_cost(self, position, cost):
+        tile, i = self.slot(position)
+        if self.journal is not None:
+            self.journal.append((self.set_cost, position, tile.costs[i]))
+        tile.costs[i] = cost
+
+    def estimate(self, position):
+        tile, i = self.slot(position)
+        return tile.estimates[i]
+
+    def stats(self):
+        cold_bytes = sum(len(blob) for blob in self.cold.values())
+        return {
+            "hot_tiles": len(self.hot),
+            "cold_tiles": len(self.cold) + (sum(1 for key in self.spill.slots if key not in self.hot)
+                                            if self.spill is not None else 0),
+            "hot_kib": len(self.hot) * TILE_BYTES // 1024,
+            "cold_kib": cold_bytes // 1024,
+            "spilled_kib": self.spill.end // 1024 if self.spill is not None else 0,
+            "hits": self.hits,
+            "faults": self.faults,
+            "compactions": self.compactions,
+        }
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+
+
+# lib.ancestry.AncestorIndex over the parent codes of a TileStore, with depth and jump pointer per cell kept
+# in the tiles. Children aren't stored: they are the neighbours whose parent code points back.
+class TileAncestry:
+    def __init__(self, store):
+        self.store = store
+
+    def __contains__(self, node):
+        return node in self.store
+
+    def jump(self, node):
+        tile, i = self.store.slot(node)
+        return (tile.jumps[2 * i], tile.jumps[2 * i + 1])
+
+    def depth(self, node):
+        tile, i = self.store.slot(node)
+        return tile.depths[i]
+
+    def link(self, node, parent):
+        if parent is None:
+            depth = 0
+            jump = node
+        else:
+            depth = self.depth(parent) + 1
+            jump = self.jump(parent)
+            jump_jump = self.jump(jump)
+            if depth - 1 - self.depth(jump) == self.depth(jump) - self.depth(jump_jump):
+                jump = jump_jump
+            else:
+                jump = parent
+        tile, i = self.store.slot(node)
+        tile.depths[i] = depth
+        tile.jumps[2 * i] = jump[0]
+        tile.jumps[2 * i + 1] = jump[1]
+
+    def children(self, node):
+        store = self.store
+        x, y = node
+        children = list()
+        if 0 < x & TILE_MASK < TILE_MASK and 0 < y & TILE_MASK < TILE_MASK:
+            # All neighbours are in the same tile, read its arrays directly.
+            tile, i = store.slot(node)
+            flags = tile.flags
+            parents = tile.parents
+            for code, (offset, back) in enumerate(CHILD_OFFSETS):
+                if parents[i + offset] == back and flags[i + offset] & KNOWN:
+                    children.append((x + DIRECTIONS[code][0], y + DIRECTIONS[code][1]))
+            return children
+        for dx, dy in DIRECTIONS:
+            child = (x + dx, y + dy)
+            if child in store and store.parent(child) == node:
+                children.append(child)
+        return children
+
+    # The store has set the parent code already.
+    def add(self, node, parent):
+        self.refresh(node)
+
+    def remove(self, node):
+        pass
+
+    def reparent(self, node, parent):
+        if parent is not None and self.depth(parent) >= self.depth(node) and \
+                self.level_ancestor(parent, self.depth(node)) == node:
+            print("Error: TileAncestry.reparent() would create a cycle.")
+            raise ValueError
+        self.refresh(node)
+
+    # Recomputes depth and jump pointer of node's subtree top-down.
+    def refresh(self, node):
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            self.link(current, self.store.parent(current))
+            pending.extend(self.children(current))
+
+    def level_ancestor(self, node, depth):
+        store = self.store
+        while self.depth(node) > depth:
+            jump = self.jump(node)
+            if self.depth(jump) >= depth:
+                node = jump
+            else:
+                node = store.parent(node)
+        return node
+
+    def is_ancestor(self, ancestor, node):
+        return self.depth(ancestor) <= self.depth(node) and \
+            self.level_ancestor(node, self.depth(ancestor)) == ancestor
+
+    def lca(self, a, b):
+        store = self.store
+        if self.depth(a) > self.depth(b):
+            a = self.level_ancestor(a, self.depth(b))
+        elif self.depth(b) > self.depth(a):
+            b = self.level_ancestor(b, self.depth(a))
+        while a != b:
+            jump_a = self.jump(a)
+            jump_b = self.jump(b)
+            if jump_a != jump_b:
+                a = jump_a
+                b = jump_b
+            else:
+                a = store.parent(a)
+                b = store.parent(b)
+        return a
+
+    def next_step(self, ancestor, node):
+        return self.level_ancestor(node, self.depth(ancestor) + 1)
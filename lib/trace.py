@@ -0,0 +1,84 @@
+import json
+import time
+
+OFF = 0
+INFO = 1
+DEBUG = 2
+LEVELS = {"off": OFF, "info": INFO, "debug": DEBUG}
+
+
+# Leveled logging, per-phase timers, counters and an optional JSONL trace with one record per tick.
+# Log messages are %-formatted only when their level is enabled, so disabled logging costs one comparison.
+class Tracer:
+    def __init__(self, level="info", sink=None):
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        self.sink = open(sink, "w") if isinstance(sink, str) else sink
+        self.ticks = 0
+        self.times = dict()
+        self.tick_times = dict()
+        self.counters = dict()
+        self.gauges = dict()
+        self.peaks = dict()
+        self.phase = None
+        self.since = 0
+
+    def info(self, message, *args):
+        if self.level >= INFO:
+            print(message % args if args else message)
+
+    def debug(self, message, *args):
+        if self.level >= DEBUG:
+            print(message % args if args else message)
+
+    # Charges the time since the last switch to the current phase and makes phase the current one.
+    # Returns the previous phase so a nested phase can hand the clock back to it. None stops the clock.
+    def switch(self, phase):
+        now = time.perf_counter_ns()
+        previous = self.phase
+        if previous is not None:
+            elapsed = now - self.since
+            self.times[previous] = self.times.get(previous, 0) + elapsed
+            self.tick_times[previous] = self.tick_times.get(previous, 0) + elapsed
+        self.phase = phase
+        self.since = now
+        return previous
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+        if value > self.peaks.get(name, value - 1):
+            self.peaks[name] = value
+
+    # Closes the tick: writes its trace record if a sink is set.
+    def end_tick(self, **fields):
+        self.ticks += 1
+        if self.sink is not None:
+            record = {"tick": self.ticks, "t": self.tick_times}
+            record.update(self.gauges)
+            record.update(fields)
+            self.sink.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.tick_times = dict()
+
+    def summary(self):
+        return {
+            "ticks": self.ticks,
+            "time_ms": {phase: total / 1e6 for phase, total in self.times.items()},
+            "us_per_tick": {phase: total / 1e3 / self.ticks for phase, total in self.times.items()} if self.ticks else {},
+            "counters": dict(self.counters),
+            "peaks": dict(self.peaks),
+        }
+
+    def report(self, extra=None):
+        summary = self.summary()
+        if extra:
+            summary.update(extra)
+        print("SUMMARY")
+        for key, value in summary.items():
+            print(f"  {key}: {value}")
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
@@ -0,0 +1,330 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+import lib.codec
+import lib.utils
+from lib.simulator import Backend
+from lib.solver import Solver
+from lib.store import DictStore, GridStore
+from lib.tiles import TileStore
+from lib.trace import Tracer, OFF
+
+STORES = {
+    "grid": GridStore,
+    "dict": DictStore,
+    "tiles": TileStore,
+}
+BASELINE = os.path.join("baselines", "microbench.json")
+
+
+# The tick decode as it was before lib.codec: two json.loads, then a walls dict and a neighbours dict.
+def getWalls_before(square):
+    WALLS = [0b1000, 0b0100, 0b0010, 0b0001]
+    return {
+        "north": square & WALLS[0] != 0,
+        "east": square & WALLS[1] != 0,
+        "south": square & WALLS[2] != 0,
+        "west": square & WALLS[3] != 0
+    }
+
+
+def getNeighbours_before(position, walls):
+    neighbours = dict()
+    x = position[0]
+    y = position[1]
+    if not walls['north']:
+        neighbours[(x, y-1)] = 0
+    if not walls['east']:
+        neighbours[(x+1, y)] = 90
+    if not walls['south']:
+        neighbours[(x, y+1)] = 180
+    if not walls['west']:
+        neighbours[(x-1, y)] = 270
+    return neighbours
+
+
+def decode_before(message):
+    [action, payload] = json.loads(message)
+    game_state = json.loads(payload["gameState"])
+    position = (game_state['player']['position']['x'], game_state['player']['position']['y'])
+    return getNeighbours_before(position, getWalls_before(game_state['square']))
+
+
+def decode_after(message):
+    action, payload, game_state = lib.codec.decode_tick(message)
+    position = (game_state['player']['position']['x'], game_state['player']['position']['y'])
+    return lib.utils.getNeighbours(position, game_state['square'])
+
+
+def quiet_solver(store, **settings):
+    return Solver(**settings, store=STORES[store], tracer=Tracer(OFF))
+
+
+# game-instance frames of the cells along the rows of a simulator maze, so all kinds of squares show up.
+def sample_frames(count):
+    backend = Backend()
+    game_id = backend.create_game(4, seed=0)["entityId"]
+    game = backend.games[game_id]
+    frames = list()
+    for i in range(count):
+        game.position = (i % game.maze.width, i // game.maze.width % game.maze.height)
+        frames.append(backend.game_instance(game))
+    return frames
+
+
+# Row width of the chains, at least 10 rows and at most 1000 cells a row.
+def chain_width(depth):
+    return max(1, min(depth // 10, 1000))
+
+
+# A parent chain of depth cells snaking through rows, linked both ways like a corridor.
+# Returns the solver and the chain from the root.
+def chain_solver(depth, store):
+    solver = quiet_solver(store)
+    cells = solver.cells
+    width = chain_width(depth)
+    chain = list()
+    for i in range(depth):
+        row = i // width
+        x = i % width if row % 2 == 0 else width - 1 - i % width
+        chain.append((x, row))
+    cells.add(chain[0], None, 0)
+    for i in range(1, depth):
+        cells.add(chain[i], chain[i - 1], i)
+        rotation = cells_rotation(chain[i - 1], chain[i])
+        cells.link(chain[i - 1], chain[i], rotation)
+        cells.link(chain[i], chain[i - 1], lib.utils.get_opposite_angle(rotation))
+    for cell in chain:
+        cells.set_visited(cell)
+    return solver, chain
+
+
+def cells_rotation(a, b):
+    return {(0, -1): 0, (1, 0): 90, (0, 1): 180, (-1, 0): 270}[(b[0] - a[0], b[1] - a[1])]
+
+
+# Each setup returns a function that runs a batch of operations and returns how many it ran.
+
+def setup_getNeighbours(param, store):
+    squares = list(range(16)) * 64
+    def run():
+        for square in squares:
+            lib.utils.getNeighbours((5, 5), square)
+        return len(squares)
+    return run
+
+
+def setup_decode_before(param, store):
+    frames = sample_frames(2000)
+    def run():
+        for frame in frames:
+            decode_before(frame)
+        return len(frames)
+    return run
+
+
+def setup_decode_tick(param, store):
+    frames = sample_frames(2000)
+    def run():
+        for frame in frames:
+            decode_after(frame)
+        return len(frames)
+    return run
+
+
+# Closing a loop across the first turn of the chain lowers the cost of everything behind it by 2 and moves that
+# whole subtree up in the parent tree. One op is the propagation plus its rollback, which puts the chain back.
+# (propagate replaced update_cell_previous_path.)
+def setup_propagate(depth, store):
+    solver, chain = chain_solver(depth, store)
+    width = chain_width(depth)
+    # Second last cell of the first row and the cell right below it, second in the next row.
+    above = chain[width - 2]
+    below = chain[width + 1]
+    def run():
+        for _ in range(3):
+            solver.checkpoint()
+            solver.cells.link(above, below, 180)
+            solver.cells.link(below, above, 0)
+            solver.propagate(below, above)
+            solver.rollback()
+        return 3
+    return run
+
+
+def setup_findCommonAncestor(depth, store):
+    solver, chain = chain_solver(depth, store)
+    pairs = [(chain[-1 - i % depth], chain[(i * 7919) % depth]) for i in range(1000)]
+    def run():
+        for a, b in pairs:
+            solver.findCommonAncestor(a, b)
+        return len(pairs)
+    return run
+
+
+# Explores a size x size maze in breadth-first order, one create_neighbour_cells per cell.
+def setup_create_neighbour_cells(size, store):
+    backend = Backend()
+    maze = backend.games[backend.create_game(7, seed=0, size=(size, size))["entityId"]].maze
+    solver = quiet_solver(store)
+    solver.cells.add(maze.start, None, 0)
+    order = deque([maze.start])
+    seen = {maze.start}
+    cells = list()
+    while order and len(cells) < 50000:
+        cell = order.popleft()
+        cells.append(cell)
+        for neighbour in lib.utils.getNeighbours(cell, maze.square(cell)):
+            if neighbour not in seen:
+                seen.add(neighbour)
+                order.append(neighbour)
+    def run():
+        for cell in cells:
+            solver.create_neighbour_cells(lib.utils.getNeighbours(cell, maze.square(cell)), cell)
+            solver.cells.set_visited(cell)
+        return len(cells)
+    return run
+
+
+# Plays a size x size maze with generate_commands straight on the simulator's game, without JSON.
+# One op is a tick. Games are cut off at 20000 ticks.
+def setup_ticks(settings):
+    def setup(size, store):
+        backend = Backend()
+        game = backend.games[backend.create_game(7, seed=0, size=(size, size))["entityId"]]
+        solver = quiet_solver(store, **settings)
+        def run():
+            ticks = 0
+            with contextlib.redirect_stdout(io.StringIO()):
+                while game.status == "IN_PROGRESS" and ticks < 20000:
+                    game.run_command(solver.generate_commands(game.game_state()))
+                    ticks += 1
+            return ticks
+        return run
+    return setup
+
+
+# name -> (parameter, uses a store, setup). The parameter is "size" (maze side), "depth" (DFS tree depth) or None.
+CASES = {
+    "getNeighbours": (None, False, setup_getNeighbours),
+    "decode_before": (None, False, setup_decode_before),
+    "decode_tick": (None, False, setup_decode_tick),
+    "propagate": ("depth", True, setup_propagate),
+    "findCommonAncestor": ("depth", True, setup_findCommonAncestor),
+    "create_neighbour_cells": ("size", True, setup_create_neighbour_cells),
+    "dfs_tick": ("size", True, setup_ticks({"use_DFS": True})),
+    "a_star_tick": ("size", True, setup_ticks({"use_DFS": False})),
+}
+
+
+# Best time per op over repeat fresh runs, then one more run under tracemalloc for the allocations:
+# bytes still held afterwards per op and the peak of the run above where it started.
+def measure(setup, param, store, repeat):
+    best = None
+    for _ in range(repeat):
+        run = setup(param, store)
+        gc.collect()
+        start = time.perf_counter_ns()
+        ops = run()
+        elapsed = time.perf_counter_ns() - start
+        if best is None or elapsed / ops < best:
+            best = elapsed / ops
+    run = setup(param, store)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    ops = run()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ns_per_op": best, "net_bytes_per_op": (current - before) / ops, "peak_kib": (peak - before) / 1024}
+
+
+def case_keys(names, sizes, depths, stores):
+    keys = list()
+    for name in names:
+        parameter, uses_store, setup = CASES[name]
+        params = {"size": sizes, "depth": depths, None: [None]}[parameter]
+        for param in params:
+            for store in (stores if uses_store else [None]):
+                label = name
+                if param is not None:
+                    label += f"[{parameter}={param}]"
+                if store is not None:
+                    label += f"/{store}"
+                keys.append((label, setup, param, store))
+    return keys
+
+
+# Cases slower than baseline by more than tolerance, as (label, ratio).
+def regressions(results, baseline, tolerance):
+    slower = list()
+    for label, result in results.items():
+        base = baseline["results"].get(label)
+        if base is not None and result["ns_per_op"] > base["ns_per_op"] * (1 + tolerance):
+            slower.append((label, result["ns_per_op"] / base["ns_per_op"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of lib.utils and the solver's hot paths.")
+    parser.add_argument("cases", nargs="*", help=f"Cases to run, all by default: {' '.join(CASES)}.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000], help="Maze sides.")
+    parser.add_argument("--depths", type=int, nargs="+", default=[1000, 100000], help="DFS tree depths (at least 40).")
+    parser.add_argument("--stores", nargs="+", choices=STORES.keys(), default=["grid"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", nargs="?", const=BASELINE, default=None, metavar="FILE",
+                        help=f"Save the results as baseline (default {BASELINE}).")
+    parser.add_argument("--check", nargs="?", const=BASELINE, default=None, metavar="FILE",
+                        help=f"Compare with a saved baseline (default {BASELINE}) and fail on regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="How much slower than baseline a case may be, 0.25 = 25%%.")
+    args = parser.parse_args()
+    for name in args.cases:
+        if name not in CASES:
+            parser.error(f"Unknown case {name}")
+    if min(args.depths) < 40:
+        parser.error("--depths must be at least 40")
+
+    baseline = None
+    if args.check is not None:
+        with open(args.check) as file:
+            baseline = json.load(file)
+
+    results = dict()
+    print(f"{'case':<48} {'ns/op':>12} {'B/op':>10} {'peak KiB':>10} {'vs base':>8}")
+    for label, setup, param, store in case_keys(args.cases or list(CASES), args.sizes, args.depths, args.stores):
+        result = measure(setup, param, store, args.repeat)
+        results[label] = result
+        base = baseline["results"].get(label) if baseline is not None else None
+        ratio = f"{result['ns_per_op'] / base['ns_per_op']:>7.2f}x" if base is not None else ""
+        print(f"{label:<48} {result['ns_per_op']:>12.0f} {result['net_bytes_per_op']:>10.0f} "
+              f"{result['peak_kib']:>10.0f} {ratio:>8}", flush=True)
+
+    if args.save is not None:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as file:
+            json.dump({"python": sys.version.split()[0], "machine": platform.machine(),
+                       "orjson": lib.codec.orjson is not None, "results": results}, file, indent=1)
+        print(f"Saved baseline to {args.save}")
+
+    if baseline is not None:
+        slower = regressions(results, baseline, args.tolerance)
+        if slower:
+            print(f"\nREGRESSION: {len(slower)} case(s) more than {args.tolerance:.0%} slower than {args.check}:")
+            for label, ratio in slower:
+                print(f"  {label}: {ratio:.2f}x")
+            sys.exit(1)
+        print(f"No regressions against {args.check}")
+
+
+if __name__ == "__main__":
+    main()
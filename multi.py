@@ -0,0 +1,163 @@
+import time
+
+START = time.perf_counter()
+
+import argparse
+import asyncio
+import contextlib
+import io
+
+from lib.client import GameSession, play_games
+
+# Everything else is imported where it's needed, so a live run doesn't load the simulator and an offline one
+# doesn't load requests, websockets or dotenv.
+
+
+def solver_for(settings, trace_level):
+    from lib.solver import Solver
+    from lib.trace import Tracer
+    return Solver(**settings, tracer=Tracer(trace_level))
+
+
+# Creates the games on threads while the websocket handshake runs, and hands every game to play_games as soon as
+# it exists. Games are created through one pooled HTTP session, so they share kept-alive connections.
+async def run_live(level_ids, solver_settings, trace_level, recorder):
+    import websockets
+    from dotenv import dotenv_values
+    from lib.client import BACKEND_BASE, create_live_game, http_session
+    token = dotenv_values()["PLAYER_TOKEN"]
+    http = http_session(len(level_ids))
+    arrivals = asyncio.Queue()
+    failures = list()
+
+    async def create(level_id):
+        try:
+            game_id = await asyncio.to_thread(create_live_game, http, level_id, token)
+        except Exception as error:
+            failures.append((level_id, error))
+            await arrivals.put(None)
+            return
+        session = GameSession(game_id, solver_for(solver_settings, trace_level), level=level_id)
+        session.created = time.perf_counter()
+        await arrivals.put(session)
+
+    creations = [asyncio.create_task(create(level_id)) for level_id in level_ids]
+    async with websockets.connect(f"wss://{BACKEND_BASE}/{token}/") as connection:
+        connected = time.perf_counter()
+        if recorder is not None:
+            connection = recorder_connection(connection, recorder)
+        sessions = await play_games(connection, [], arrivals, len(level_ids))
+    await asyncio.gather(*creations)
+    http.close()
+    return sessions, failures, connected
+
+
+# Same as run_live against the offline simulator. delay simulates both the HTTP and the websocket round trip.
+async def run_offline(levels, seeds, solver_settings, delay, rate_limit, trace_level, recorder):
+    from lib.simulator import Backend, LocalConnection
+    backend = Backend(rate_limit)
+    arrivals = asyncio.Queue()
+    games = [(level, seed) for level in levels for seed in seeds]
+
+    async def create(level, seed):
+        await asyncio.sleep(delay)
+        game_id = (await asyncio.to_thread(backend.create_game, level, seed=seed))["entityId"]
+        session = GameSession(game_id, solver_for(solver_settings, trace_level), level=level)
+        session.created = time.perf_counter()
+        await arrivals.put(session)
+
+    creations = [asyncio.create_task(create(level, seed)) for level, seed in games]
+    await asyncio.sleep(delay)
+    connected = time.perf_counter()
+    connection = LocalConnection(backend, delay)
+    if recorder is not None:
+        connection = recorder_connection(connection, recorder)
+    sessions = await play_games(connection, [], arrivals, len(games))
+    await asyncio.gather(*creations)
+    return sessions, [], connected
+
+
+def recorder_connection(connection, recorder):
+    from lib.recording import RecordingConnection
+    return RecordingConnection(connection, recorder)
+
+
+def ms(t):
+    return "-" if t is None else f"{(t - START) * 1000:.0f}"
+
+
+def status_of(session):
+    state = session.game_state or {}
+    return "error" if session.error is not None else state.get("status", "finished" if session.finished else "?")
+
+
+def print_summary(sessions, elapsed):
+    for session in sessions:
+        state = session.game_state or {}
+        print(f"{session.game_id}: {status_of(session)}, ticks {session.ticks}, score {state.get('score')}, "
+              f"{session.pacer.tick_rate():.0f} ticks/s, {session.pacer.errors} errors")
+    print(f"{len(sessions)} games in {elapsed:.1f}s")
+
+
+# Startup latency per game, in ms since the process started.
+def print_latency(sessions, connected):
+    print(f"connected at {ms(connected)} ms")
+    print(f"{'game':>38} {'level':>8} {'status':>12} {'ticks':>7} {'score':>7} "
+          f"{'created ms':>10} {'subscribed ms':>13} {'first tick ms':>13}")
+    for session in sorted(sessions, key=lambda session: session.created):
+        state = session.game_state or {}
+        print(f"{session.game_id:>38} {session.level:>8} {status_of(session):>12} {session.ticks:>7} "
+              f"{str(state.get('score')):>7} {ms(session.created):>10} {ms(session.subscribed):>13} "
+              f"{ms(session.first_tick):>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many games concurrently over one connection, headless: "
+                                                 "no browser, no fixed delays.")
+    parser.add_argument("levels", nargs="+", help="Level ids, or level numbers with --offline.")
+    parser.add_argument("--offline", action="store_true", help="Play against the offline simulator.")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="Maze seeds (offline).")
+    parser.add_argument("--delay", type=float, default=0, help="Simulated round trip in seconds (offline).")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="Minimum seconds between commands of a game before the simulator rejects them (offline).")
+    parser.add_argument("--astar", action="store_true", help="Use A* instead of DFS.")
+    parser.add_argument("--frontier", action="store_true", help="Head for the cheapest-to-reach frontier cell instead of DFS.")
+    parser.add_argument("--record", metavar="FILE", default=None, help="Record all frames to FILE for replay.py.")
+    parser.add_argument("--latency", action="store_true",
+                        help="Report when each game was created, subscribed to and got its first tick.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the solvers' per-tick output.")
+    args = parser.parse_args()
+
+    trace_level = "debug" if args.verbose else "off"
+    solver_settings = {"use_DFS": not args.astar}
+    if args.frontier:
+        solver_settings = {"use_DFS": False, "use_frontier": True, "dist_to_go_factor": 3}
+    recorder = None
+    if args.record is not None:
+        from lib.recording import Recorder
+        recorder = Recorder(args.record, {"offline": args.offline, "solver": solver_settings})
+    start = time.perf_counter()
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        if args.offline:
+            sessions, failures, connected = asyncio.run(run_offline(
+                [int(level) for level in args.levels], args.seeds, solver_settings, args.delay, args.rate_limit,
+                trace_level, recorder))
+        else:
+            sessions, failures, connected = asyncio.run(run_live(args.levels, solver_settings, trace_level, recorder))
+    if recorder is not None:
+        recorder.close()
+    elapsed = time.perf_counter() - start
+
+    if args.latency:
+        print_latency(sessions, connected)
+    else:
+        print_summary(sessions, elapsed)
+    for level_id, error in failures:
+        print(f"level {level_id}: {error}")
+    if args.latency:
+        print(f"done at {ms(time.perf_counter())} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import contextlib
+import io
+
+from benchmark import MODES, STORES, run_game, print_results
+from lib.recording import load_recording, recorded_states, recorded_commands, recorded_game_ids, reconstruct_maze
+from lib.solver import Solver
+from lib.trace import Tracer, OFF
+
+
+# Feeds the recorded game states to a solver with the recorded settings and returns the index of the first
+# command that differs from the recorded one, or None if all of them match.
+# Every game state but the last was answered by exactly one command, so states and commands pair up 1:1.
+def check_commands(states, commands, solver_settings):
+    solver = Solver(**solver_settings, tracer=Tracer(OFF))
+    previous = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, (state, command) in enumerate(zip(states, commands)):
+            # Unchanged state means the command was rejected and this one is the resend, not a new tick.
+            if state == previous or state['status'] != "IN_PROGRESS":
+                continue
+            previous = state
+            if solver.generate_commands(state) != command:
+                return i
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded game against the offline simulator.")
+    parser.add_argument("recording", help="File written by main.py (RECORD_FILE) or multi.py --record.")
+    parser.add_argument("--game", default=None, help="Game id, needed if the recording has many games.")
+    parser.add_argument("--modes", nargs="+", choices=MODES.keys(), default=["dfs", "astar"])
+    parser.add_argument("--stores", nargs="+", choices=STORES.keys(), default=["grid"])
+    parser.add_argument("--max-ticks", type=int, default=200000)
+    parser.add_argument("--check", action="store_true",
+                        help="Check that the recorded solver settings still produce the recorded commands.")
+    args = parser.parse_args()
+
+    info, frames = load_recording(args.recording)
+    game_ids = recorded_game_ids(frames)
+    if args.game is None and len(game_ids) > 1:
+        parser.error(f"Recording has {len(game_ids)} games, pick one with --game: {' '.join(game_ids)}")
+    game_id = args.game if args.game is not None else game_ids[0]
+    states = recorded_states(frames, game_id)
+    commands = recorded_commands(frames, game_id)
+    maze = reconstruct_maze(states)
+    last = states[-1]
+    print(f"{game_id}: {maze.width}x{maze.height}, recorded {last['status']}, ticks {last['timer']}, "
+          f"score {last['score']}, {len(commands)} commands sent")
+
+    if args.check:
+        solver_settings = info.get("solver", {})
+        tick = check_commands(states, commands, solver_settings)
+        if tick is None:
+            print(f"check: all commands match with {solver_settings}")
+        else:
+            print(f"check: first different command is command {tick} with {solver_settings}")
+
+    results = list()
+    for mode in args.modes:
+        for store in args.stores:
+            results.append(run_game("rec", mode, None, args.max_ticks, store=store, maze=maze))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from benchmark import run_game
+from lib.simulator import LEVELS
+
+# Base settings of the modes a sweep can vary. Which knobs matter depends on the mode, see configurations.
+SWEEP_MODES = {
+    "dfs": {"use_DFS": True},
+    "astar": {"use_DFS": False},
+    "frontier": {"use_DFS": False, "use_frontier": True},
+}
+
+
+# All solver settings to try. Knobs that can't change a game are left out so the same game isn't played twice:
+# DFS sorts neighbours by dist_to_go_factor times their distance, which is the same order for any factor, and
+# never reads dist_traveled_factor. A* and frontier don't read use_heuristics_in_dfs, frontier not
+# dist_traveled_factor either.
+def configurations(modes, go_factors, traveled_factors, heuristics):
+    configs = list()
+    for mode in modes:
+        if mode == "dfs":
+            for use_heuristics in heuristics:
+                configs.append((mode, {"use_heuristics_in_dfs": use_heuristics}))
+        elif mode == "astar":
+            for go, traveled in itertools.product(go_factors, traveled_factors):
+                configs.append((mode, {"dist_to_go_factor": go, "dist_traveled_factor": traveled}))
+        else:
+            for go in go_factors:
+                configs.append((mode, {"dist_to_go_factor": go}))
+    return configs
+
+
+def describe(mode, config):
+    return " ".join([mode] + [f"{key}={value}" for key, value in config.items()])
+
+
+# Runs in a worker process: plays one game and adds the CPU time it took.
+def play(level, seed, mode, config, max_ticks):
+    start = time.process_time()
+    result = run_game(level, mode, seed, max_ticks, settings={**SWEEP_MODES[mode], **config})
+    result["cpu_s"] = time.process_time() - start
+    result["config"] = describe(mode, config)
+    return result
+
+
+# One row per configuration, best first: the most finished games, then the lowest score or the fewest ticks
+# over all games (rank_by picks which comes first), then the least CPU time. Score is the ticks since the last
+# reset, i.e. what the game is judged by. Ticks is the whole game, exploration included.
+def rank(results, rank_by="score"):
+    rows = dict()
+    for r in results:
+        row = rows.setdefault(r["config"], {"config": r["config"], "games": 0, "finished": 0, "ticks": 0,
+                                            "score": 0, "cpu_s": 0})
+        row["games"] += 1
+        row["finished"] += r["result"] == "finished"
+        row["ticks"] += r["ticks"]
+        row["score"] += r["score"]
+        row["cpu_s"] += r["cpu_s"]
+    other = "ticks" if rank_by == "score" else "score"
+    return sorted(rows.values(), key=lambda row: (-row["finished"], row[rank_by], row[other], row["cpu_s"]))
+
+
+def print_ranking(rows):
+    width = max([len(row["config"]) for row in rows] + [6])
+    header = f"{'rank':>4} {'config':<{width}} {'finished':>8} {'ticks':>10} {'score':>10} {'cpu s':>8} {'us/tick':>8}"
+    print(header)
+    print("-" * len(header))
+    for i, row in enumerate(rows):
+        us_per_tick = row["cpu_s"] * 1e6 / row["ticks"] if row["ticks"] else 0
+        print(f"{i + 1:>4} {row['config']:<{width}} {row['finished']:>4}/{row['games']:<3} {row['ticks']:>10} "
+              f"{row['score']:>10} {row['cpu_s']:>8.2f} {us_per_tick:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep solver settings over many offline mazes on all cores.")
+    parser.add_argument("--levels", type=int, nargs="+", default=[3, 4])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2, 3])
+    parser.add_argument("--modes", nargs="+", choices=SWEEP_MODES.keys(), default=["dfs", "astar"])
+    parser.add_argument("--go-factors", type=float, nargs="+", default=[1, 1.5, 3],
+                        help="dist_to_go_factor values.")
+    parser.add_argument("--traveled-factors", type=float, nargs="+", default=[0.2, 0.5, 1],
+                        help="dist_traveled_factor values (A*).")
+    parser.add_argument("--heuristics", choices=["on", "off"], nargs="+", default=["on", "off"],
+                        help="use_heuristics_in_dfs values (DFS).")
+    parser.add_argument("--max-ticks", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: all cores).")
+    parser.add_argument("--rank-by", choices=["score", "ticks"], default="score",
+                        help="Rank by total score (ticks after the reset) or by total ticks of the games.")
+    parser.add_argument("--json", metavar="FILE", default=None, help="Also write every game result to FILE as JSON lines.")
+    args = parser.parse_args()
+
+    for level in args.levels:
+        if level not in LEVELS:
+            parser.error(f"Unknown level {level}")
+    configs = configurations(args.modes, args.go_factors, args.traveled_factors,
+                             [value == "on" for value in args.heuristics])
+    # Longest games first so a big maze doesn't start last and keep one core busy at the end.
+    jobs = [(level, seed, mode, config) for level in sorted(args.levels, reverse=True) for seed in args.seeds
+            for mode, config in configs]
+    print(f"{len(configs)} configurations x {len(args.levels) * len(args.seeds)} mazes = {len(jobs)} games "
+          f"on {args.workers} workers")
+
+    start = time.perf_counter()
+    results = list()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(play, level, seed, mode, config, args.max_ticks) for level, seed, mode, config in jobs]
+        for future in as_completed(futures):
+            results.append(future.result())
+            print(f"\r{len(results)}/{len(jobs)} games", end="", flush=True)
+    print(f"\r{len(jobs)} games in {time.perf_counter() - start:.1f}s")
+
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            for r in results:
+                file.write(json.dumps(r) + "\n")
+    print_ranking(rank(results, args.rank_by))
+
+
+if __name__ == "__main__":
+    main()
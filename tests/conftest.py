@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts and lib/ are imported from the repo root, like when running them.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
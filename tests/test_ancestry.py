@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from lib.ancestry import AncestorIndex
+from lib.store import DictStore, GridStore
+from lib.tiles import TileStore
+
+
+# Depth and lowest common ancestor the slow way, by walking parents.
+def path_to_root(parents, node):
+    path = [node]
+    while parents[path[-1]] is not None:
+        path.append(parents[path[-1]])
+    return path
+
+
+def naive_lca(parents, a, b):
+    ancestors = set(path_to_root(parents, a))
+    for node in path_to_root(parents, b):
+        if node in ancestors:
+            return node
+
+
+def check(index, parents, rng):
+    nodes = list(parents)
+    for node in nodes:
+        assert index.depth(node) == len(path_to_root(parents, node)) - 1
+    for _ in range(300):
+        a = rng.choice(nodes)
+        b = rng.choice(nodes)
+        lca = naive_lca(parents, a, b)
+        assert index.lca(a, b) == lca
+        assert index.is_ancestor(lca, a) and index.is_ancestor(lca, b)
+        if a != lca:
+            path = path_to_root(parents, a)
+            assert index.next_step(lca, a) == path[path.index(lca) - 1]
+
+
+def test_lca_and_depth_after_reparent():
+    rng = random.Random(1)
+    index = AncestorIndex()
+    parents = {0: None}
+    index.add(0, None)
+    # A long chain with branches, so jump pointers skip over many nodes.
+    for node in range(1, 600):
+        parent = node - 1 if rng.random() < 0.8 else rng.randrange(node)
+        parents[node] = parent
+        index.add(node, parent)
+    check(index, parents, rng)
+
+    for _ in range(200):
+        node = rng.randrange(1, 600)
+        subtree = {n for n in parents if node in path_to_root(parents, n)}
+        parent = rng.choice([n for n in parents if n not in subtree])
+        parents[node] = parent
+        index.reparent(node, parent)
+    check(index, parents, rng)
+
+
+def test_reparent_into_own_subtree_is_refused():
+    index = AncestorIndex()
+    index.add("a", None)
+    index.add("b", "a")
+    index.add("c", "b")
+    with pytest.raises(ValueError):
+        index.reparent("a", "c")
+
+
+def test_remove_leaf():
+    index = AncestorIndex()
+    index.add("a", None)
+    index.add("b", "a")
+    index.add("c", "a")
+    index.remove("c")
+    assert "c" not in index
+    assert index.lca("b", "a") == "a"
+
+
+# The stores keep the index of their parent tree, whose parents must be neighbouring cells.
+# Cells of a 16x16 grid get a random spanning tree, then random cells move to another neighbour.
+@pytest.mark.parametrize("store", [GridStore, DictStore, TileStore])
+def test_store_ancestry_after_set_parent(store):
+    rng = random.Random(2)
+    cells = store()
+    parents = {(0, 0): None}
+    cells.add((0, 0), None, 0)
+    open_cells = [(0, 0)]
+    while open_cells:
+        cell = open_cells.pop(rng.randrange(len(open_cells)))
+        for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1)):
+            other = (cell[0] + dx, cell[1] + dy)
+            if 0 <= other[0] < 16 and 0 <= other[1] < 16 and other not in parents:
+                parents[other] = cell
+                cells.add(other, cell, 0)
+                open_cells.append(other)
+    check(cells.ancestry, parents, rng)
+
+    for _ in range(300):
+        node = rng.choice(list(parents))
+        subtree = {n for n in parents if node in path_to_root(parents, n)}
+        options = [(node[0] + dx, node[1] + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+        options = [n for n in options if n in parents and n not in subtree]
+        if not options:
+            continue
+        parents[node] = rng.choice(options)
+        cells.set_parent(node, parents[node])
+    check(cells.ancestry, parents, rng)
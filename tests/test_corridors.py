@@ -0,0 +1,59 @@
+import contextlib
+import io
+import random
+
+import pytest
+
+from lib.planner import find_route
+from lib.simulator import Backend
+from lib.solver import Solver
+from lib.trace import Tracer, OFF
+
+ROTATIONS = (0, 45, 90, 135, 180, 225, 270, 315)
+
+
+# Ticks to follow route from position facing rotation, walked on the real maze. Fails if a move hits a wall.
+def walk(maze, position, rotation, route):
+    ticks = 0
+    for cell, cell_rotation in route:
+        if cell_rotation != rotation:
+            rotation = cell_rotation
+            ticks += 1
+        position = maze.step(position, rotation)
+        assert position == cell
+        ticks += 1
+    return ticks
+
+
+# Every few ticks of an A* game, routes between random known cells over corridors cost the same as routes over
+# single cells, and can be walked in that many ticks. Walks stay cached between the checks, so they also have to
+# be dropped correctly as links are found.
+@pytest.mark.parametrize("level,seed", [(3, 0), (3, 1), (4, 1), (4, 2)])
+def test_corridor_routes_cost_the_same(level, seed):
+    rng = random.Random(seed)
+    backend = Backend()
+    game = backend.games[backend.create_game(level, seed=seed)["entityId"]]
+    solver = Solver(use_DFS=False, tracer=Tracer(OFF))
+    assert solver.corridors is not None
+    checked = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        while game.status == "IN_PROGRESS" and not solver.shortest_path_found:
+            command = solver.generate_commands(game.game_state())
+            game.run_command(command)
+            if game.timer % 50 != 0:
+                continue
+            cells = solver.cells
+            known = [(x, y) for y in range(game.maze.height) for x in range(game.maze.width)
+                     if (x, y) in cells and cells.visited((x, y))]
+            for _ in range(20):
+                start, goal = rng.choice(known), rng.choice(known)
+                rotation = rng.choice(ROTATIONS)
+                expected = find_route(cells, start, rotation, goal)
+                result = solver.corridors.find_route(start, rotation, goal)
+                assert (expected is None) == (result is None)
+                if result is None:
+                    continue
+                assert result[0] == expected[0]
+                assert walk(game.maze, start, rotation, result[1]) == result[0]
+                checked += 1
+    assert checked > 100
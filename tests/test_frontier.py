@@ -0,0 +1,86 @@
+import contextlib
+import heapq
+import io
+
+import pytest
+
+from lib.planner import known_moves
+from lib.simulator import Backend
+from lib.solver import Solver
+from lib.trace import Tracer, OFF
+
+
+# Travel cost from position to every known cell, searching the whole explored maze. Like choose_frontier it
+# doesn't search beyond frontier cells.
+def all_costs(solver, position):
+    cells = solver.cells
+    costs = {position: 0}
+    open_set = [(0, position)]
+    while open_set:
+        cost, cell = heapq.heappop(open_set)
+        if cost > costs[cell] or cell in solver.prio_queue:
+            continue
+        for neighbour in known_moves(cells, cell):
+            if neighbour in cells and cost + 1 < costs.get(neighbour, cost + 2):
+                costs[neighbour] = cost + 1
+                heapq.heappush(open_set, (cost + 1, neighbour))
+    return costs
+
+
+def connect(cells, a, b):
+    rotation = {(0, -1): 0, (1, 0): 90, (0, 1): 180, (-1, 0): 270}[(b[0] - a[0], b[1] - a[1])]
+    cells.link(a, b, rotation)
+    cells.link(b, a, (rotation + 180) % 360)
+
+
+# With dist_to_go_factor above 1, a cell one move further can score lower than a cell that is found first:
+# (1, 0) scores 1 + 3 * 9 = 28 and is popped before (1, 1), but (2, 1) behind it scores 2 + 3 * 8 = 26.
+def test_choose_frontier_keeps_searching_past_first_frontier_cell():
+    target = {'x': 10, 'y': 0}
+    solver = Solver(use_DFS=False, use_frontier=True, dist_to_go_factor=3, tracer=Tracer(OFF))
+    cells = solver.cells
+    for position, parent, cost in [((0, 0), None, 0), ((0, 1), (0, 0), 1), ((1, 1), (0, 1), 2),
+                                   ((1, 0), (0, 0), 1), ((2, 1), (1, 1), 3)]:
+        estimate = 3 * max(abs(position[0] - target['x']), abs(position[1] - target['y']))
+        cells.add(position, parent, cost, estimate)
+        if position in [(1, 0), (2, 1)]:
+            solver.prio_queue.push(position, estimate)
+        else:
+            cells.set_visited(position)
+    connect(cells, (0, 0), (0, 1))
+    connect(cells, (0, 1), (1, 1))
+    connect(cells, (0, 0), (1, 0))
+    connect(cells, (1, 1), (2, 1))
+    assert solver.choose_frontier((0, 0), target) == (2, 1)
+
+
+# Plays a frontier game and compares every cell choose_frontier picks with the argmin over all frontier cells.
+@pytest.mark.parametrize("factor", [0.5, 1, 3])
+@pytest.mark.parametrize("level,seed", [(3, 0), (3, 1), (4, 2)])
+def test_choose_frontier_matches_brute_force(factor, level, seed):
+    backend = Backend()
+    game = backend.games[backend.create_game(level, seed=seed)["entityId"]]
+    solver = Solver(use_DFS=False, use_frontier=True, dist_to_go_factor=factor, tracer=Tracer(OFF))
+    choose_frontier = solver.choose_frontier
+    choices = list()
+
+    def checked_choose_frontier(position, target):
+        best = choose_frontier(position, target)
+        costs = all_costs(solver, position)
+        scores = [costs[cell] + solver.cells.estimate(cell) for cell in costs if cell in solver.prio_queue]
+        if best is None:
+            assert not scores
+        else:
+            assert costs[best] + solver.cells.estimate(best) == min(scores)
+        choices.append(best)
+        return best
+
+    solver.choose_frontier = checked_choose_frontier
+    with contextlib.redirect_stdout(io.StringIO()):
+        while game.status == "IN_PROGRESS" and game.timer < 50000:
+            command = solver.generate_commands(game.game_state())
+            if command is None:
+                break
+            game.run_command(command)
+    assert game.status == "FINISHED"
+    assert len(choices) > 10
@@ -0,0 +1,73 @@
+import heapq
+import random
+
+from lib.heap import IndexedHeap
+
+
+# Random pushes, decrease-keys, removes and pops, checked against heapq with stale entries skipped.
+def test_pop_order_matches_heapq():
+    rng = random.Random(3)
+    heap = IndexedHeap()
+    reference = list()
+    priorities = dict()
+    for _ in range(20000):
+        op = rng.random()
+        if op < 0.45:
+            key = (rng.randrange(60), rng.randrange(60))
+            priority = rng.randrange(1000)
+            heap.push(key, priority)
+            # Pushing a key again only ever lowers its priority.
+            if key not in priorities or (priority, key) < (priorities[key], key):
+                priorities[key] = priority
+                heapq.heappush(reference, (priority, key))
+        elif op < 0.55 and priorities:
+            key = rng.choice(list(priorities))
+            heap.remove(key)
+            del priorities[key]
+        elif priorities:
+            while reference[0][1] not in priorities or priorities[reference[0][1]] != reference[0][0]:
+                heapq.heappop(reference)
+            expected = heapq.heappop(reference)
+            assert heap.peek() == expected
+            assert heap.pop() == expected
+            del priorities[expected[1]]
+        assert len(heap) == len(priorities)
+        assert all(heap.heap[i][1] == key for key, i in heap.index.items())
+
+    drained = [heap.pop() for _ in range(len(heap))]
+    assert drained == sorted((priority, key) for key, priority in priorities.items())
+
+
+def test_higher_priority_push_is_ignored():
+    heap = IndexedHeap()
+    heap.push("a", 5)
+    heap.push("a", 7)
+    heap.push("a", 2)
+    assert heap.pop() == (2, "a")
+    assert len(heap) == 0
+    assert heap.stats()["rejected"] == 1
+    assert heap.stats()["decreases"] == 1
+
+
+# Rolling back the journal puts back the same entries, in a valid heap.
+def test_journal_rollback():
+    rng = random.Random(4)
+    heap = IndexedHeap()
+    for key in range(200):
+        heap.push(key, rng.randrange(100))
+    before = sorted(heap.heap)
+    heap.journal = list()
+    for _ in range(300):
+        op = rng.random()
+        if op < 0.4:
+            heap.push(rng.randrange(300), rng.randrange(100))
+        elif op < 0.6 and len(heap):
+            heap.remove(rng.choice(list(heap.index)))
+        elif len(heap):
+            heap.pop()
+    journal = heap.journal
+    heap.journal = None
+    for inverse in reversed(journal):
+        inverse[0](*inverse[1:])
+    assert sorted(heap.heap) == before
+    assert [heap.pop() for _ in range(len(heap))] == before
@@ -0,0 +1,100 @@
+import contextlib
+import io
+import os
+
+from lib.knowledge import MazeCache, HEADER, MAGIC
+from lib.maze import ORTHOGONAL, generate_maze
+from lib.simulator import Backend
+from lib.solver import Solver
+from lib.trace import Tracer, OFF
+
+
+def game_state(columns, rows, x=0, y=0, square=0b1001):
+    return {"columns": columns, "rows": rows, "start": {"x": 0, "y": 0}, "target": {"x": columns - 1, "y": rows - 1},
+            "player": {"position": {"x": x, "y": y}, "rotation": 0}, "square": square}
+
+
+def test_known_squares_survive_reopening(tmp_path):
+    cache = MazeCache(str(tmp_path), 1)
+    assert cache.observe(game_state(4, 4, 1, 2, 0b0101))
+    cache.close()
+    cache = MazeCache(str(tmp_path), 1)
+    cache.open(game_state(4, 4))
+    assert cache.known() == {(1, 2): 0b0101}
+    cache.close()
+
+
+# A file with the right size but a header of another maze must not hand out that maze's walls.
+def test_wrong_header_of_same_size_clears_cells(tmp_path):
+    cache = MazeCache(str(tmp_path), 1)
+    cache.open(game_state(4, 4))
+    path = cache.path
+    cache.close()
+    with open(path, "r+b") as file:
+        file.write(HEADER.pack(MAGIC, 2, 8) + bytes([0x10 | 0b0101]) * 16)
+    assert os.path.getsize(path) == HEADER.size + 16
+
+    cache = MazeCache(str(tmp_path), 1)
+    cache.open(game_state(4, 4))
+    assert cache.known() == {}
+    cache.close()
+
+
+def play(maze, cache_dir, max_ticks=50000):
+    backend = Backend()
+    game = backend.games[backend.add_game(maze)["entityId"]]
+    knowledge = MazeCache(cache_dir, "test")
+    solver = Solver(knowledge=knowledge, tracer=Tracer(OFF))
+    positions = list()
+    with contextlib.redirect_stdout(io.StringIO()):
+        while game.status == "IN_PROGRESS" and game.timer < max_ticks:
+            command = solver.generate_commands(game.game_state())
+            if command is None:
+                break
+            game.run_command(command)
+            positions.append(game.position)
+    knowledge.close()
+    return game, positions
+
+
+def connected(maze):
+    seen = {maze.start}
+    pending = [maze.start]
+    while pending:
+        cell = pending.pop()
+        for rotation in ORTHOGONAL:
+            other = maze.step(cell, rotation)
+            if other is not None and other not in seen:
+                seen.add(other)
+                pending.append(other)
+    return maze.target in seen
+
+
+# The second run takes the cached route. Then a wall is put on that route: the game has to notice, explore
+# again and still finish.
+def test_game_finishes_when_cached_maze_got_a_new_wall(tmp_path):
+    maze = generate_maze(40, 40, seed=3, loop_density=0.05)
+    first, _ = play(maze, str(tmp_path))
+    assert first.status == "FINISHED"
+    second, positions = play(maze, str(tmp_path))
+    assert second.status == "FINISHED"
+    assert second.timer < first.timer
+
+    route = positions[positions.index(maze.start):]
+    walled = False
+    for a, b in list(zip(route, route[1:]))[len(route) // 2:]:
+        for rotation, (wall, dx, dy, opposite) in ORTHOGONAL.items():
+            if (a[0] + dx, a[1] + dy) != b:
+                continue
+            maze.walls[a[1] * maze.width + a[0]] |= wall
+            maze.walls[b[1] * maze.width + b[0]] |= opposite
+            if connected(maze):
+                walled = True
+            else:
+                maze.remove_wall(a, rotation)
+        if walled:
+            break
+    assert walled
+
+    third, _ = play(maze, str(tmp_path))
+    assert third.status == "FINISHED"
@@ -0,0 +1,140 @@
+import contextlib
+import io
+
+from lib.pruning import enclosed_regions, split_seeds
+from lib.solver import Solver
+from lib.store import GridStore
+from lib.trace import Tracer, OFF
+
+# Maps for the tests: '#' is a visited cell, 'P' the cell just visited, '.' unexplored, 'T' the (unexplored)
+# target. The maze is exactly as big as the map.
+POCKET = [
+    ".......",
+    ".###...",
+    ".#..P..",
+    ".###...",
+    "......T",
+]
+CORNER = [
+    "..#....",
+    "..P....",
+    "###....",
+    "......T",
+]
+
+
+def parse(rows):
+    cells = GridStore()
+    position = goal = None
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row):
+            if char in "#P":
+                cells.add((x, y), None, 0)
+                cells.set_visited((x, y))
+            if char == "P":
+                position = (x, y)
+            if char == "T":
+                goal = (x, y)
+    return cells, (len(rows[0]), len(rows)), position, goal
+
+
+def test_pocket_with_one_way_in():
+    cells, size, position, goal = parse(POCKET)
+    assert sorted(split_seeds(cells, set(), size, position)) == [(3, 2), (4, 1)]
+    assert [sorted(region) for region in enclosed_regions(cells, set(), size, position, goal)] == [[(2, 2), (3, 2)]]
+
+
+def test_no_split_in_open_space():
+    cells, size, position, goal = parse([
+        ".....",
+        ".....",
+        "..P..",
+        ".....",
+        "....T",
+    ])
+    assert len(split_seeds(cells, set(), size, position)) < 2
+    assert enclosed_regions(cells, set(), size, position, goal) == []
+
+
+# With the target in the pocket it's the rest of the maze that is cut off from it.
+def test_target_inside_pocket():
+    rows = [row.replace("T", ".") for row in POCKET]
+    rows[2] = ".#T.P.."
+    cells, size, position, goal = parse(rows)
+    regions = enclosed_regions(cells, set(), size, position, goal)
+    assert len(regions) == 1
+    assert goal not in regions[0] and (3, 2) not in regions[0]
+    assert (6, 4) in regions[0] and (0, 0) in regions[0]
+
+
+# Cells outside the maze block like visited ones, so the corner is a pocket.
+def test_region_touching_the_border():
+    cells, size, position, goal = parse(CORNER)
+    regions = enclosed_regions(cells, set(), size, position, goal)
+    assert [sorted(region) for region in regions] == [[(0, 0), (0, 1), (1, 0), (1, 1)]]
+
+
+# Dead cells count as explored too.
+def test_dead_cells_block():
+    cells, size, position, goal = parse(CORNER)
+    dead = {(0, 0), (1, 0), (0, 1), (1, 1)}
+    assert enclosed_regions(cells, dead, size, position, goal) == []
+
+
+def test_flood_over_budget_counts_as_open():
+    cells, size, position, goal = parse(CORNER)
+    assert enclosed_regions(cells, set(), size, position, goal, budget=3) == []
+    assert len(enclosed_regions(cells, set(), size, position, goal, budget=4)) == 1
+
+
+# Once the pocket is known to be enclosed, the other region must hold the target and isn't walked, however big.
+def test_last_region_is_not_walked():
+    rows = [row + "." * 200 for row in CORNER] + ["." * 207] * 200
+    cells, size, position, _ = parse(rows)
+    regions = enclosed_regions(cells, set(), size, position, (206, 203), budget=10)
+    assert [sorted(region) for region in regions] == [[(0, 0), (0, 1), (1, 0), (1, 1)]]
+
+
+# The pocket of POCKET seen by a solver: (3, 2) is a frontier cell found from position. With two_ways the
+# pocket is also known to open to (1, 2) through the frontier cell (2, 2).
+def pocket_solver(settings, two_ways):
+    solver = Solver(**settings, tracer=Tracer(OFF))
+    cells, size, position, goal = parse(POCKET)
+    solver.cells = cells
+    solver.maze_size = size
+    frontier = [((3, 2), position, 270)]
+    if two_ways:
+        frontier.append(((2, 2), (1, 2), 90))
+    for cell, parent, rotation in frontier:
+        cells.add(cell, parent, 1)
+        cells.link(parent, cell, rotation)
+        cells.link(cell, parent, (rotation + 180) % 360)
+        solver.prio_queue.push(cell, 1)
+        solver.stack.append(cell)
+    solver.prio_queue.push((5, 2), 1)
+    solver.stack.append((5, 2))
+    with contextlib.redirect_stdout(io.StringIO()):
+        solver.prune_enclosed(position, {'x': goal[0], 'y': goal[1]})
+    return solver
+
+
+def test_astar_drops_pocket_with_one_way_in():
+    solver = pocket_solver({"use_DFS": False}, two_ways=False)
+    assert solver.dead == {(2, 2), (3, 2)}
+    assert (3, 2) not in solver.prio_queue and (5, 2) in solver.prio_queue
+
+
+# A* is after the shortest path, a pocket with two ways in might still be a shortcut between them.
+def test_astar_keeps_pocket_with_two_ways_in():
+    solver = pocket_solver({"use_DFS": False}, two_ways=True)
+    assert solver.dead == set()
+    assert (3, 2) in solver.prio_queue and (2, 2) in solver.prio_queue
+
+
+def test_dfs_and_frontier_drop_pocket_with_two_ways_in():
+    solver = pocket_solver({"use_DFS": True}, two_ways=True)
+    assert solver.dead == {(2, 2), (3, 2)}
+    assert solver.stack == [(5, 2)]
+    solver = pocket_solver({"use_DFS": False, "use_frontier": True}, two_ways=True)
+    assert solver.dead == {(2, 2), (3, 2)}
+    assert len(solver.prio_queue) == 1
@@ -0,0 +1,61 @@
+import contextlib
+import io
+import json
+
+from lib.codec import encode_command
+from lib.recording import Recorder, load_recording, recorded_states, recorded_commands
+from lib.simulator import Backend
+from lib.solver import Solver
+from lib.trace import Tracer, OFF
+from replay import check_commands
+
+SETTINGS = {"use_DFS": True}
+
+
+# Plays a game against the simulator and records it. Every reject_every-th command is rejected the way a rate
+# limited backend does it: an error frame, the unchanged game state, then the client sends the command again.
+def record_game(path, reject_every):
+    backend = Backend()
+    game_id = backend.create_game(2, seed=0)["entityId"]
+    game = backend.games[game_id]
+    solver = Solver(**SETTINGS, tracer=Tracer(OFF))
+    recorder = Recorder(path, {"offline": True, "solver": SETTINGS})
+    recorder.sent(json.dumps(["sub-game", {"id": game_id}]))
+    message = backend.game_instance(game)
+    recorder.received(message)
+    sent = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        while game.status == "IN_PROGRESS":
+            state = json.loads(json.loads(message)[1]["gameState"])
+            command = encode_command(game_id, solver.generate_commands(state))
+            sent += 1
+            if sent % reject_every == 0:
+                recorder.sent(command)
+                recorder.received(json.dumps(["error", {"message": "Too many requests"}]))
+                recorder.received(backend.game_instance(game))
+            recorder.sent(command)
+            for message in backend.handle(command):
+                recorder.received(message)
+    recorder.close()
+
+
+def test_check_matches_recording_with_rejected_ticks(tmp_path):
+    path = tmp_path / "game.jsonl.gz"
+    record_game(path, reject_every=3)
+    info, frames = load_recording(path)
+    states = recorded_states(frames)
+    commands = recorded_commands(frames)
+    assert states[-1]["status"] == "FINISHED"
+    assert len(states) == len(commands) + 1
+    assert any(a == b for a, b in zip(states, states[1:]))
+    assert check_commands(states, commands, info["solver"]) is None
+
+
+def test_check_finds_changed_command(tmp_path):
+    path = tmp_path / "game.jsonl.gz"
+    record_game(path, reject_every=3)
+    info, frames = load_recording(path)
+    states = recorded_states(frames)
+    commands = recorded_commands(frames)
+    commands[10] = {"action": "move"} if commands[10] != {"action": "move"} else {"action": "rotate", "rotation": 0}
+    assert check_commands(states, commands, info["solver"]) == 10
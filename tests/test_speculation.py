@@ -0,0 +1,109 @@
+import contextlib
+import io
+
+import pytest
+
+from lib.simulator import Backend
+from lib.solver import Solver
+from lib.speculation import Speculator, predict_next_state
+from lib.store import DictStore, GridStore
+from lib.tiles import TileStore
+from lib.trace import Tracer, OFF
+
+MODES = {
+    "dfs": {"use_DFS": True},
+    "astar": {"use_DFS": False},
+    "frontier": {"use_DFS": False, "use_frontier": True, "dist_to_go_factor": 3},
+}
+STORES = {"grid": GridStore, "dict": DictStore, "tiles": TileStore}
+
+
+# Everything a tick can change: the store with its parent tree, the open set, the route planner and the rest
+# of the solver's search state. Counters are left out, they aren't rolled back.
+def search_state(solver, size):
+    cells = solver.cells
+    known = dict()
+    for y in range(size[1]):
+        for x in range(size[0]):
+            position = (x, y)
+            if position in cells:
+                known[position] = (cells.neighbours(position), cells.parent(position), cells.cost(position),
+                                   cells.estimate(position), cells.visited(position),
+                                   cells.ancestry.depth(position))
+    heap = solver.prio_queue
+    assert all(heap.heap[i][1] == key for key, i in heap.index.items())
+    planner = solver.planner
+    return {
+        "cells": known,
+        "count": len(cells),
+        "version": cells.version,
+        "heap": sorted(heap.heap),
+        "planner": (planner.goal, list(planner.route), planner.index, planner.expected_position, planner.version),
+        "stack": list(solver.stack),
+        "dead": set(solver.dead),
+        "commands": list(solver.commands),
+        "flags": (solver.shortest_path_found, solver.path_optimized, solver.expected_position,
+                  solver.frontier_goal),
+    }
+
+
+def new_game(level, seed):
+    backend = Backend()
+    return backend.games[backend.create_game(level, seed=seed)["entityId"]]
+
+
+# Before every tick, a speculative tick on the predicted state (or the real one when nothing can be predicted)
+# is rolled back and has to leave exactly the state it started from.
+@pytest.mark.parametrize("store", STORES)
+@pytest.mark.parametrize("mode", MODES)
+def test_rollback_restores_search_state(mode, store):
+    game = new_game(2, 0)
+    size = (game.maze.width, game.maze.height)
+    solver = Solver(**MODES[mode], store=STORES[store], tracer=Tracer(OFF))
+    previous = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        while game.status == "IN_PROGRESS" and game.timer < 20000:
+            state = game.game_state()
+            predicted = predict_next_state(previous[0], previous[1], solver.cells) if previous else None
+            before = search_state(solver, size)
+            solver.checkpoint()
+            solver.generate_commands(predicted if predicted is not None else state)
+            solver.rollback()
+            assert search_state(solver, size) == before
+            command = solver.generate_commands(state)
+            if command is None:
+                break
+            game.run_command(command)
+            previous = (state, command)
+    assert game.status == "FINISHED"
+
+
+# Playing with a Speculator sends the same commands as playing without one. Every seventh speculation is made
+# for a wrong rotation, so rolled back misses are mixed in with the hits.
+@pytest.mark.parametrize("mode", MODES)
+def test_speculator_sends_the_same_commands(mode):
+    sent = list()
+    for speculate in (False, True):
+        game = new_game(4, 1)
+        solver = Solver(**MODES[mode], tracer=Tracer(OFF))
+        speculator = Speculator(solver) if speculate else None
+        commands = list()
+        with contextlib.redirect_stdout(io.StringIO()):
+            while game.status == "IN_PROGRESS" and game.timer < 50000:
+                state = game.game_state()
+                command = solver.generate_commands(state) if speculator is None else speculator.generate_commands(state)
+                if command is None:
+                    break
+                commands.append(command)
+                game.run_command(command)
+                if speculator is not None:
+                    if len(commands) % 7 == 0:
+                        speculator.speculate(state, {"action": "rotate", "rotation": (state['player']['rotation'] + 90) % 360})
+                    else:
+                        speculator.speculate(state, command)
+        if speculator is not None:
+            if speculator.pending is not None:
+                speculator.pending[1].result()
+            assert speculator.hits > 0 and speculator.misses > 0
+        sent.append(commands)
+    assert sent[0] == sent[1]
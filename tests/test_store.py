@@ -0,0 +1,19 @@
+import pytest
+
+from lib.store import DictStore, GridStore
+
+
+# Positions outside the grid's box, and inside it but never added, are unknown to both stores.
+@pytest.mark.parametrize("store", [GridStore, DictStore])
+@pytest.mark.parametrize("position", [(100, 100), (-1, 15), (17, 1), (14, 15)])
+def test_unknown_positions_raise(store, position):
+    cells = store()
+    cells.add((15, 15), None, 0)
+    cells.link((15, 15), (15, 14), 0)
+    assert position not in cells
+    for read in (cells.neighbours, cells.visited, cells.cost, cells.parent, cells.estimate):
+        with pytest.raises(KeyError):
+            read(position)
+    with pytest.raises(KeyError):
+        cells.neighbour_rotation(position, (position[0], position[1] - 1))
+    assert cells.neighbours((15, 15)) == {(15, 14): 0}
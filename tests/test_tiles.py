@@ -0,0 +1,14 @@
+import functools
+
+from lib.solver import Solver
+from lib.tiles import TileStore
+from lib.trace import Tracer, OFF
+
+
+def test_forget_closes_the_old_store(tmp_path):
+    solver = Solver(store=functools.partial(TileStore, spill=str(tmp_path)), tracer=Tracer(OFF))
+    old = solver.cells
+    solver.forget()
+    assert old.spill.file.closed
+    assert not solver.cells.spill.file.closed
+    solver.cells.close()